@@ -0,0 +1,52 @@
+"""Compares two results files produced by `run.py`.
+
+    $ python benchmarks/compare.py baseline.json results.json
+
+The items/sec of every scenario found in both files is printed along with the
+change relative to the baseline.
+"""
+
+import argparse
+import json
+
+KEY_FIELDS = ("page", "method", "fallbacks", "loader", "stats")
+
+
+def load_results(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report["environment"], {
+        tuple(result[field] for field in KEY_FIELDS): result
+        for result in report["results"]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("baseline")
+    parser.add_argument("results")
+    args = parser.parse_args(argv)
+
+    baseline_env, baseline = load_results(args.baseline)
+    results_env, results = load_results(args.results)
+
+    print(
+        f"baseline: {baseline_env['scrapy_loader_upkeep']} "
+        f"results: {results_env['scrapy_loader_upkeep']}"
+    )
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        before = baseline[key]["items_per_sec"]
+        after = result["items_per_sec"]
+        page, method, fallbacks, loader, stats = key
+        print(
+            f"{page:>6} {method:>9} fallbacks={fallbacks:<2} "
+            f"{loader:>6} stats={stats:<4} "
+            f"{before:>10.0f} -> {after:>10.0f} items/s "
+            f"({(after - before) / before:+.1%})"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""Synthetic listing pages used by the benchmarks.
+
+Each page has a number of 'div.product' rows where every field can be found by
+exactly one rule. The fallback rules that precede it never match anything,
+which is the worst case for the fallback parsers that are being maintained.
+"""
+
+from scrapy.http import HtmlResponse
+
+FIELDS = ["title", "price", "sku", "brand", "description"]
+
+# The approximate number of rows needed for each of the page sizes.
+PAGE_SIZES = {
+    "small": 10,  # ~10 KB
+    "medium": 250,  # ~250 KB
+    "large": 5000,  # ~5 MB
+}
+
+ROW_TEMPLATE = """
+<div class="product" data-id="{index}">
+    <h2 class="title">Product #{index}</h2>
+    <div class="details">
+        <span class="price">${index}.99</span>
+        <span class="sku">SKU-{index:08d}</span>
+        <a class="brand" href="/brand/{index}">Brand #{index}</a>
+    </div>
+    <p class="description">{description}</p>
+    <ul class="specs">{specs}</ul>
+</div>
+"""
+
+DESCRIPTION = " ".join(["Lorem ipsum dolor sit amet, consectetur adipiscing."] * 8)
+SPECS = "".join(f"<li>Spec #{index}</li>" for index in range(10))
+
+
+def make_page(size):
+    rows = "".join(
+        ROW_TEMPLATE.format(index=index, description=DESCRIPTION, specs=SPECS)
+        for index in range(PAGE_SIZES[size])
+    )
+    body = f"<html><head><title>{size}</title></head><body>{rows}</body></html>"
+    return HtmlResponse(f"https://example.com/{size}", body=body, encoding="utf-8")
+
+
+def css_rules(field, fallbacks):
+    """Returns the css rules of a field where only the last one matches."""
+
+    missing = [f".{field}-v{version}::text" for version in range(fallbacks - 1)]
+    return missing + [f".{field}::text"]
+
+
+def xpath_rules(field, fallbacks):
+    """Returns the xpath rules of a field where only the last one matches."""
+
+    missing = [
+        f".//*[@class='{field}-v{version}']/text()" for version in range(fallbacks - 1)
+    ]
+    return missing + [f".//*[@class='{field}']/text()"]
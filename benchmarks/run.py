@@ -0,0 +1,188 @@
+"""Compares the ItemLoader of this package against the stock one of Scrapy.
+
+    $ python benchmarks/run.py --output results.json
+    $ python benchmarks/run.py --quick
+
+Every scenario loads all of the rows of a synthetic page, one loader per row,
+with the given number of fallback rules per field. The results are written as
+JSON so that they can be compared across versions with `compare.py`.
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import lxml.etree
+import parsel
+import scrapy
+from scrapy.loader import ItemLoader as StockItemLoader
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from fixtures import FIELDS, PAGE_SIZES, css_rules, make_page, xpath_rules
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapy_loader_upkeep import ItemLoader  # noqa: E402
+from scrapy_loader_upkeep.__version__ import __version__  # noqa: E402
+
+
+class NoopStatsCollector:
+    """Measures the cost of the instrumentation itself."""
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        pass
+
+
+def make_stats(stats_mode):
+    if stats_mode == "on":
+        return MemoryStatsCollector(get_crawler())
+    if stats_mode == "noop":
+        return NoopStatsCollector()
+    return None
+
+
+def load_page(loader_cls, rows, rules, method, stats, reuse=False):
+    """Loads all of the rows in the page, returning the number of items.
+
+    When 'reuse' is enabled, a single loader is reset for every row.
+    """
+
+    loader = None
+    for row in rows:
+        if loader_cls is StockItemLoader:
+            loader = loader_cls(item={}, selector=row)
+        elif reuse and loader is not None:
+            loader.reset(selector=row, item={})
+        else:
+            loader = loader_cls(item={}, selector=row, stats=stats)
+
+        add = getattr(loader, method)
+        for field, field_rules in rules:
+            add(field, field_rules)
+        loader.load_item()
+    return len(rows)
+
+
+def measure(loader_cls, response, fallbacks, method, stats_mode, repeat, reuse=False):
+    rows = response.css("div.product")
+    make_rules = css_rules if method == "add_css" else xpath_rules
+    rules = [(field, make_rules(field, fallbacks)) for field in FIELDS]
+
+    # Warms up the caches like the compiled selectors and the stat labels.
+    load_page(loader_cls, rows, rules, method, make_stats(stats_mode), reuse)
+
+    latencies = []
+    for _ in range(repeat):
+        stats = make_stats(stats_mode)
+        gc.collect()
+        start = time.perf_counter()
+        items = load_page(loader_cls, rows, rules, method, stats, reuse)
+        latencies.append((time.perf_counter() - start) / items)
+
+    stats = make_stats(stats_mode)
+    tracemalloc.start()
+    load_page(loader_cls, rows, rules, method, stats, reuse)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    best = min(latencies)
+    return {
+        "items": len(rows),
+        "items_per_sec": 1 / best,
+        "latency_us": {
+            "best": best * 1e6,
+            "median": statistics.median(latencies) * 1e6,
+            "max": max(latencies) * 1e6,
+        },
+        "peak_alloc_bytes_per_item": peak / len(rows),
+    }
+
+
+def scenarios(quick):
+    if quick:
+        return itertools.product(["small"], [1, 5], ["add_css", "add_xpath"])
+    return itertools.product(PAGE_SIZES, [1, 3, 5, 10], ["add_css", "add_xpath"])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", help="path of the JSON results file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--quick", action="store_true", help="small pages only")
+    args = parser.parse_args(argv)
+
+    pages = {}
+    results = []
+    for size, fallbacks, method in scenarios(args.quick):
+        if size not in pages:
+            pages[size] = make_page(size)
+        response = pages[size]
+
+        loaders = (
+            [("stock", StockItemLoader, "off")]
+            + [
+                ("upkeep", ItemLoader, stats_mode)
+                for stats_mode in ("off", "noop", "on")
+            ]
+            + [("reset", ItemLoader, "on")]
+        )
+        for loader_name, loader_cls, stats_mode in loaders:
+            result = {
+                "page": size,
+                "page_bytes": len(response.body),
+                "fallbacks": fallbacks,
+                "method": method,
+                "loader": loader_name,
+                "stats": stats_mode,
+            }
+            result.update(
+                measure(
+                    loader_cls,
+                    response,
+                    fallbacks,
+                    method,
+                    stats_mode,
+                    args.repeat,
+                    reuse=loader_name == "reset",
+                )
+            )
+            results.append(result)
+            print(
+                f"{size:>6} {method:>9} fallbacks={fallbacks:<2} "
+                f"{loader_name:>6} stats={stats_mode:<4} "
+                f"{result['items_per_sec']:>10.0f} items/s "
+                f"{result['latency_us']['best']:>8.1f} us/item "
+                f"{result['peak_alloc_bytes_per_item']:>8.0f} B/item"
+            )
+
+    report = {
+        "version": 1,
+        "created": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "scrapy_loader_upkeep": __version__,
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "scrapy": scrapy.__version__,
+            "parsel": parsel.__version__,
+            "lxml": ".".join(map(str, lxml.etree.LXML_VERSION)),
+        },
+        "results": results,
+    }
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
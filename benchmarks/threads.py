@@ -0,0 +1,122 @@
+"""Measures the throughput of loaders running in a pool of threads.
+
+    $ python benchmarks/threads.py
+    $ python benchmarks/threads.py --threads 1 2 4 8 16
+
+Every thread loads all of the rows of the same synthetic page, one loader per
+row, while sharing a single stats object. The `ShardedStats` are compared
+against Scrapy's stats collector guarded by a lock, which is the simplest way
+to make it correct when shared by several threads. The totals of the stats are
+checked against the number of items loaded for both.
+
+lxml serializes the concurrent calls of the same compiled XPath object, so the
+`selector_cache` keeps the compiled rules of each thread apart. Running with
+`--no-selector-cache` makes the loaders evaluate the rules with parsel instead,
+which compiles them in every call. The threads only run in parallel on several
+cores, ideally on a free-threaded build.
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from fixtures import FIELDS, css_rules, make_page
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapy_loader_upkeep import ItemLoader  # noqa: E402
+from scrapy_loader_upkeep.stats import ShardedStats  # noqa: E402
+
+
+class LockedStatsCollector(MemoryStatsCollector):
+    def __init__(self, crawler):
+        super().__init__(crawler)
+        self.lock = threading.Lock()
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        with self.lock:
+            super().inc_value(key, count, start, spider)
+
+
+def make_stats(stats_mode):
+    if stats_mode == "locked":
+        stats = LockedStatsCollector(get_crawler())
+        return stats, stats
+    stats = MemoryStatsCollector(get_crawler())
+    return stats, ShardedStats(stats)
+
+
+def measure(rows, rules, threads, stats_mode, repeat, loader_cls=ItemLoader):
+    best = None
+    for _ in range(repeat):
+        stats, shared_stats = make_stats(stats_mode)
+        barrier = threading.Barrier(threads + 1)
+
+        def work():
+            barrier.wait()
+            for row in rows:
+                loader = loader_cls(item={}, selector=row, stats=shared_stats)
+                for field, field_rules in rules:
+                    loader.add_css(field, field_rules)
+                loader.load_item()
+
+        pool = [threading.Thread(target=work) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        barrier.wait()
+        start = time.perf_counter()
+        for thread in pool:
+            thread.join()
+        if stats_mode == "sharded":
+            shared_stats.flush()
+        elapsed = time.perf_counter() - start
+
+        items = threads * len(rows)
+        label = f"parser/{loader_cls.__name__}/{FIELDS[0]}/css/{len(rules[0][1])}"
+        if stats.get_value(label) != items:
+            raise AssertionError(f"{label} is {stats.get_value(label)}, not {items}")
+
+        if best is None or elapsed < best:
+            best = elapsed
+    return threads * len(rows) / best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--fallbacks", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--no-selector-cache", action="store_true")
+    args = parser.parse_args(argv)
+
+    loader_cls = ItemLoader
+    if args.no_selector_cache:
+
+        class UncachedItemLoader(ItemLoader):
+            selector_cache = None
+
+        loader_cls = UncachedItemLoader
+
+    rows = make_page("medium").css("div.product")
+    rules = [(field, css_rules(field, args.fallbacks)) for field in FIELDS]
+
+    # Warms up the caches like the compiled selectors and the stat labels.
+    measure(rows, rules, 1, "sharded", 1, loader_cls)
+
+    for threads in args.threads:
+        for stats_mode in ("locked", "sharded"):
+            items_per_sec = measure(
+                rows, rules, threads, stats_mode, args.repeat, loader_cls
+            )
+            print(
+                f"threads={threads:<3} {stats_mode:>7} {items_per_sec:>10.0f} items/s"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Measures the cost of collecting the values of fields with many matches.
+
+    $ python benchmarks/values.py
+    $ python benchmarks/values.py --output values.json
+
+A single loader is used for the whole page, with fallback rules that all
+match, from ~100 up to ~60000 values per field. The values of the rules are
+memoized so that only the cost of collecting them is measured, not the cost of
+evaluating the rules. The time and the peak memory allocated by each call of
+`replace_css()` are printed and saved as JSON, so that the results of two
+versions can be compared side by side.
+"""
+
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+from fixtures import PAGE_SIZES, make_page
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scrapy_loader_upkeep import ItemLoader  # noqa: E402
+from scrapy_loader_upkeep.__version__ import __version__  # noqa: E402
+
+RULES = ["ul.specs li::text", "span.sku::text", "h2.title::text"]
+
+
+class MemoizedItemLoader(ItemLoader):
+    memoize_rules = True
+
+
+def measure(response, repeat):
+    # This evaluates the rules once and warms up the caches like the stat
+    # labels.
+    loader = MemoizedItemLoader(item={}, response=response)
+    loader.replace_css("values", RULES)
+    values = len(loader.get_collected_values("values"))
+
+    latencies = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        loader.replace_css("values", RULES)
+        latencies.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    loader.replace_css("values", RULES)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "values": values,
+        "latency_us": {
+            "best": min(latencies) * 1e6,
+            "median": statistics.median(latencies) * 1e6,
+        },
+        "peak_alloc_bytes": peak,
+        "peak_alloc_bytes_per_value": peak / values,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--output", help="path of the JSON results file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--pages", nargs="+", choices=list(PAGE_SIZES), default=list(PAGE_SIZES)
+    )
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in args.pages:
+        result = {"page": size}
+        result.update(measure(make_page(size), args.repeat))
+        results.append(result)
+        print(
+            f"{size:>6} {result['values']:>7} values "
+            f"{result['latency_us']['best']:>10.1f} us "
+            f"{result['peak_alloc_bytes'] / 1024:>8.1f} KiB peak "
+            f"{result['peak_alloc_bytes_per_value']:>6.1f} B/value"
+        )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(
+                {"version": 1, "scrapy_loader_upkeep": __version__, "results": results},
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -104,3 +104,32 @@ class QuotesToScrapeUseName(BaseExampleSpider):
             loader.add_css("author", ".author::text", name="basic author class")
             loader.add_css("tags", ".tag::text", name="underneath the author text")
             yield loader.load_item()
+
+
+class QuotesToScrapeBulkSpider(BaseExampleSpider):
+    """Produces the same items and stats as `QuotesToScrapeUseName` but each
+    parser rule is only evaluated once for all of the quotes in the page.
+    """
+
+    name = "quotestoscrape_bulk"
+
+    def parse(self, response):
+        yield from QuotesItemLoader.load_items(
+            response,
+            self.populate_quote,
+            row_css="div.quote",
+            stats=self.crawler.stats,
+        )
+
+    def populate_quote(self, loader):
+        loader.add_css(
+            "quote",
+            [
+                # This first parser rule doesn't exist at all.
+                ".this-quote-does-not-exist span::text",
+                '.quote > span[itemprop="text"]::text',
+            ],
+            name="Quotes inside the box",
+        )
+        loader.add_css("author", ".author::text", name="basic author class")
+        loader.add_css("tags", ".tag::text", name="underneath the author text")
@@ -1 +1,2 @@
 from .loader import ItemLoader
+from .plan import Rules
@@ -0,0 +1,50 @@
+class RuleHealth:
+    """The usage of a single parser rule as learned during the crawl, which is
+    used by the 'adaptive_fallbacks' mode of the loaders.
+
+    The rule is tripped after 'threshold' consecutive misses, after which it's
+    no longer evaluated except for one probe every 'probe_interval' times. A
+    probe that produces data closes the breaker again.
+    """
+
+    __slots__ = ("evaluations", "hits", "consecutive_misses", "suppressed")
+
+    def __init__(self):
+        self.evaluations = 0
+        self.hits = 0
+        self.consecutive_misses = 0
+        self.suppressed = 0
+
+    @property
+    def hit_rate(self):
+        """The smoothed hit rate so that the rules that have barely been
+        evaluated aren't ranked at either extreme.
+        """
+
+        return (self.hits + 1) / (self.evaluations + 2)
+
+    def record(self, hit):
+        self.evaluations += 1
+        if hit:
+            self.hits += 1
+            self.consecutive_misses = 0
+            self.suppressed = 0
+        else:
+            self.consecutive_misses += 1
+
+    def allow(self, threshold, probe_interval):
+        """Returns whether the rule should be evaluated this time."""
+
+        if threshold is None or self.consecutive_misses < threshold:
+            return True
+
+        self.suppressed += 1
+        return bool(probe_interval) and self.suppressed % probe_interval == 0
+
+
+def rank(healths):
+    """Returns the indexes of the given `RuleHealth`s from the highest hit rate
+    to the lowest one, keeping the declared order between equal rates.
+    """
+
+    return sorted(range(len(healths)), key=lambda index: -healths[index].hit_rate)
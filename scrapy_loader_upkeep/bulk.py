@@ -0,0 +1,157 @@
+import re
+
+from lxml import etree
+
+from .cache import compile_rule, is_supported, serialize, to_xpath
+
+# Only the rules that never leave the subtree of their context node can be
+# evaluated for all of the rows at once. The string literals are blanked out
+# before checking for the forbidden axes and operators.
+_STRING_LITERALS = re.compile(r"'[^']*'|\"[^\"]*\"")
+_RELATIVE_START = re.compile(r"(?:[\w-]+::|\.|@|\*|[\w-]+(?::[\w-]+)?\b(?!\s*\())")
+_FORBIDDEN = re.compile(
+    r"\.\.|\||\$|\b(?:ancestor|parent|preceding|following)[\w-]*\s*::"
+)
+
+
+def is_row_relative(xpath):
+    """Returns True when the given xpath is a relative location path that only
+    uses the downward axes. This guarantees that its results are inside the
+    subtree of the row it's evaluated on.
+    """
+
+    xpath = _STRING_LITERALS.sub("''", xpath).strip()
+    return bool(_RELATIVE_START.match(xpath)) and not _FORBIDDEN.search(xpath)
+
+
+class BulkRows:
+    """Evaluates each rule once for all of the rows in a document and splits
+    the results back to the rows they belong to.
+
+    For the rows selected by 'row_xpath', a rule like '.author::text' is
+    evaluated as a single '(row_xpath)/descendant-or-self::...' query against
+    the whole document. Each of the resulting nodes is then assigned to the row
+    which is its ancestor.
+
+    The rules that can't be evaluated this way (e.g. absolute xpaths or ones
+    using the upward axes), as well as the documents having nested rows, fall
+    back to evaluating the rule on every row.
+    """
+
+    def __init__(self, selector, row_xpath, cache=None):
+        self.selector = selector
+        self.row_xpath = row_xpath
+        self.rows = selector.xpath(row_xpath)
+        self.cache = cache
+        self.results = {}
+        self.row_indexes = self.get_row_indexes()
+
+    @classmethod
+    def from_selector(cls, selector, row_css=None, row_xpath=None, cache=None):
+        if (row_css is None) == (row_xpath is None):
+            raise ValueError("Exactly one of 'row_css' or 'row_xpath' is needed.")
+
+        if row_css is not None:
+            row_xpath = selector._css2xpath(row_css)
+
+        return cls(selector, row_xpath, cache=cache)
+
+    def get_row_indexes(self):
+        """Maps the root node of every row into its index, or returns None when
+        the rows can't be evaluated in bulk.
+        """
+
+        if not is_supported(self.selector) or not isinstance(
+            self.selector.root, etree._Element
+        ):
+            return None
+
+        row_indexes = {}
+        for index, row in enumerate(self.rows):
+            if not isinstance(row.root, etree._Element):
+                return None
+            row_indexes[row.root] = index
+
+        # The results of nested rows can't be told apart by their ancestry.
+        for root in row_indexes:
+            for ancestor in root.iterancestors():
+                if ancestor in row_indexes:
+                    return None
+
+        return row_indexes
+
+    def extract(self, index, rule_type, rule):
+        """Returns the same values as `row.css(rule).getall()` (or its xpath
+        counterpart) for the row in the given 'index'.
+        """
+
+        key = (rule_type, rule)
+        try:
+            values = self.results[key]
+        except KeyError:
+            values = self.results[key] = self.evaluate(rule_type, rule)
+
+        if values is not None:
+            return values[index]
+
+        row = self.rows[index]
+        if self.cache is not None:
+            return self.cache.extract(row, rule_type, rule)
+        return getattr(row, rule_type)(rule).getall()
+
+    def evaluate(self, rule_type, rule):
+        """Evaluates the rule for all of the rows, returning a list with the
+        values of each row. None is returned if it can't be done in bulk.
+        """
+
+        if self.row_indexes is None:
+            return None
+
+        selector_type = self.selector.type
+        xpath = to_xpath(rule_type, selector_type, rule)
+        if not is_row_relative(xpath):
+            return None
+
+        # The smart strings are needed to know where the text and attribute
+        # results are located in the document.
+        xpath = f"({self.row_xpath})/{xpath}"
+        try:
+            if self.cache is not None:
+                compiled = self.cache.get(
+                    "xpath", selector_type, xpath, smart_strings=True
+                )
+            else:
+                compiled = compile_rule(
+                    "xpath", selector_type, xpath, smart_strings=True
+                )
+        except ValueError:
+            return None
+
+        result = compiled(self.selector.root)
+        if type(result) is not list:
+            return None
+
+        values = [[] for _ in self.row_indexes]
+        method = self.selector._tostring_method
+        for node in result:
+            index = self.find_row(node)
+            if index is None:
+                return None
+            values[index].append(serialize(node, method))
+        return values
+
+    def find_row(self, node):
+        """Returns the index of the row containing the given result node."""
+
+        if isinstance(node, etree._Element):
+            element = node
+        else:
+            getparent = getattr(node, "getparent", None)
+            element = getparent() if getparent is not None else None
+
+        while element is not None:
+            index = self.row_indexes.get(element)
+            if index is not None:
+                return index
+            element = element.getparent()
+        return None
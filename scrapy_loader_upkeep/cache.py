@@ -0,0 +1,236 @@
+import threading
+from collections import OrderedDict
+
+from lxml import etree
+from parsel import Selector, SelectorList
+from parsel.csstranslator import GenericTranslator, HTMLTranslator
+
+# These are the same translators used by parsel to convert the css rules into
+# xpath ones for each of the selector types.
+TRANSLATORS = {"html": HTMLTranslator(), "xml": GenericTranslator()}
+
+DEFAULT_NAMESPACES = Selector._default_namespaces
+
+
+class ThreadEntries:
+    """The entries of a `SelectorCache` that belong to a single thread."""
+
+    __slots__ = ("entries", "pinned")
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.pinned = {}
+
+
+class SelectorCache:
+    """A bounded LRU cache of compiled css/xpath rules which is meant to be
+    shared by all of the ItemLoader instances in the process.
+
+    Each css rule is translated into xpath only once and every xpath is only
+    compiled once into an `lxml.etree.XPath` object, instead of being done again
+    in every `selector.css()` and `selector.xpath()` call.
+
+    The rules can also be pinned, like the ones declared in the extraction plan
+    of a loader class, which keeps them out of the LRU entries so they're never
+    evicted nor cleared.
+
+    The 'hits', 'misses' and 'evictions' counters are kept to help in sizing
+    the cache properly.
+
+    Since lxml serializes the concurrent calls of the same compiled XPath, the
+    entries are kept per thread so the loaders running in several threads never
+    wait on each other. Each thread compiles the rules it uses, including the
+    pinned ones, and holds up to 'maxsize' entries. The counters are shared and
+    are approximate in that case.
+    """
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._pinned = set()
+        self._local = threading.local()
+
+    def __len__(self):
+        return len(self.get_thread_entries().entries)
+
+    def get_thread_entries(self):
+        """Returns the `ThreadEntries` of the current thread."""
+
+        try:
+            return self._local.entries
+        except AttributeError:
+            thread_entries = self._local.entries = ThreadEntries()
+            return thread_entries
+
+    def get(self, rule_type, selector_type, rule, smart_strings=False):
+        """Returns the compiled `lxml.etree.XPath` object of the given rule.
+
+        The 'rule_type' is either 'css' or 'xpath' while the 'selector_type' is
+        the type of the document it'll be used on, either 'html' or 'xml'.
+        """
+
+        try:
+            thread_entries = self._local.entries
+        except AttributeError:
+            thread_entries = self.get_thread_entries()
+
+        # The pinned rules are looked up first since they're the ones of the
+        # extraction plans, which are evaluated the most.
+        key = (rule_type, selector_type, rule, smart_strings)
+        compiled = thread_entries.pinned.get(key)
+        if compiled is not None:
+            self.hits += 1
+            return compiled
+
+        try:
+            compiled = thread_entries.entries[key]
+        except KeyError:
+            compiled = compile_rule(
+                rule_type, selector_type, rule, smart_strings=smart_strings
+            )
+            if key in self._pinned:
+                self.misses += 1
+                thread_entries.pinned[key] = compiled
+                return compiled
+            return self.add(key, compiled)
+
+        self.hits += 1
+        thread_entries.entries.move_to_end(key)
+        return compiled
+
+    def pin(self, rule_type, selector_type, rule, smart_strings=False):
+        """Compiles the given rule, if it's not pinned yet, and keeps it for the
+        lifetime of the cache. The other threads compile it again on their
+        first use of it.
+        """
+
+        pinned = self.get_thread_entries().pinned
+        key = (rule_type, selector_type, rule, smart_strings)
+        try:
+            return pinned[key]
+        except KeyError:
+            compiled = pinned[key] = compile_rule(
+                rule_type, selector_type, rule, smart_strings=smart_strings
+            )
+            self._pinned.add(key)
+            return compiled
+
+    def lookup(self, key, factory):
+        """Returns the entry of the given key, calling 'factory()' to create it
+        when it's not in the cache of the current thread yet.
+        """
+
+        entries = self.get_thread_entries().entries
+        try:
+            entry = entries[key]
+        except KeyError:
+            return self.add(key, factory())
+
+        self.hits += 1
+        entries.move_to_end(key)
+        return entry
+
+    def add(self, key, entry):
+        entries = self.get_thread_entries().entries
+        self.misses += 1
+        entries[key] = entry
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return entry
+
+    def extract(self, selector, rule_type, rule):
+        """Works the same way as `selector.css(rule).getall()` (or its xpath
+        counterpart) but uses the compiled rules in the cache.
+        """
+
+        if isinstance(selector, SelectorList):
+            return [
+                value
+                for member in selector
+                for value in self.extract(member, rule_type, rule)
+            ]
+
+        # Fallback to parsel on the selectors that aren't supported here, like
+        # the ones having custom namespaces registered.
+        if not is_supported(selector):
+            return getattr(selector, rule_type)(rule).getall()
+
+        root = selector.root
+        if not isinstance(root, etree._Element):
+            return []
+
+        result = self.get(rule_type, selector.type, rule)(root)
+        if type(result) is not list:
+            result = [result]
+
+        method = selector._tostring_method
+        return [serialize(node, method) for node in result]
+
+    def info(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size": len(self),
+            "maxsize": self.maxsize,
+            "pinned": len(self._pinned),
+        }
+
+    def clear(self):
+        """Clears the LRU entries of every thread, while the pinned rules are
+        kept.
+        """
+
+        self._local = threading.local()
+        self.hits = self.misses = self.evictions = 0
+
+
+def is_supported(selector):
+    """Returns True if the rules can be compiled for the given selector."""
+
+    return selector.type in TRANSLATORS and selector.namespaces == DEFAULT_NAMESPACES
+
+
+def to_xpath(rule_type, selector_type, rule):
+    if rule_type == "css":
+        return TRANSLATORS[selector_type].css_to_xpath(rule)
+    return rule
+
+
+def compile_rule(rule_type, selector_type, rule, smart_strings=False):
+    """Translates the rule into xpath when needed and compiles it.
+
+    Invalid xpaths raise a `ValueError` like how parsel does.
+    """
+
+    xpath = to_xpath(rule_type, selector_type, rule)
+    try:
+        return etree.XPath(
+            xpath, namespaces=DEFAULT_NAMESPACES, smart_strings=smart_strings
+        )
+    except etree.XPathError as exc:
+        raise ValueError(f"XPath error: {exc} in {xpath}")
+
+
+def serialize(node, method="html"):
+    """Converts a single xpath result into a string the same way as parsel's
+    `Selector.get()`.
+    """
+
+    if isinstance(node, str):
+        return str(node)
+    try:
+        return etree.tostring(node, method=method, encoding="unicode", with_tail=False)
+    except (AttributeError, TypeError):
+        if node is True:
+            return "1"
+        elif node is False:
+            return "0"
+        return str(node)
+
+
+# This is shared by all of the ItemLoader instances by default.
+selector_cache = SelectorCache()
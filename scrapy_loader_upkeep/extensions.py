@@ -0,0 +1,468 @@
+import logging
+import os
+import weakref
+from datetime import datetime, timezone
+
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+
+from .latency import RuleLatencies
+from .loader import ItemLoader
+from .metrics import MetricsServer, RuleMetrics
+from .signals import rule_hit_rate_dropped
+from .registry import RuleRegistry
+from .snapshots import registry_rules, write_snapshot
+from .volume import RuleVolumes
+from .windows import RuleWindows
+
+logger = logging.getLogger(__name__)
+
+# The `RuleRegistry` of each crawler, which is shared by the `RuleUsageReport`
+# and `RuleUsageSnapshot` extensions when they're both enabled.
+crawler_registries = weakref.WeakKeyDictionary()
+
+
+def get_rule_registry(crawler):
+    try:
+        return crawler_registries[crawler]
+    except KeyError:
+        registry = crawler_registries[crawler] = RuleRegistry()
+        return registry
+
+
+# The `LoaderDefaults` of the spiders that are running, from the first one that
+# was opened, and the values that the `ItemLoader` class attributes had before
+# any of them were set.
+active_defaults = []
+original_defaults = {}
+
+
+class LoaderDefaults:
+    """The class attributes of `ItemLoader` that an extension sets as the
+    defaults of all of the loaders while the spider of its crawler is running.
+
+    The class attributes are recomputed from all of the running spiders when
+    one is opened or closed. The ones of the latest opened spider win while
+    several crawlers overlap in the same process, and the original values are
+    put back once none of them sets the attribute anymore, so the
+    instrumentation doesn't leak into the crawlers that haven't enabled the
+    extension.
+    """
+
+    def __init__(self, **defaults):
+        self.defaults = defaults
+
+    def set(self):
+        if self in active_defaults:
+            return
+
+        for attr in self.defaults:
+            if attr not in original_defaults:
+                original_defaults[attr] = getattr(ItemLoader, attr)
+        active_defaults.append(self)
+        apply_loader_defaults()
+
+    def restore(self):
+        if self not in active_defaults:
+            return
+
+        active_defaults.remove(self)
+        apply_loader_defaults()
+
+
+def apply_loader_defaults():
+    """Sets every `ItemLoader` class attribute to the value of the latest
+    opened spider that sets it, or back to its original value.
+    """
+
+    for attr in list(original_defaults):
+        for loader_defaults in reversed(active_defaults):
+            if attr in loader_defaults.defaults:
+                setattr(ItemLoader, attr, loader_defaults.defaults[attr])
+                break
+        else:
+            setattr(ItemLoader, attr, original_defaults.pop(attr))
+
+
+class RuleLatencyStats:
+    """Times the evaluation of every parser rule and dumps the summary of their
+    latencies into the stats when the spider is closed.
+
+    Enable it with the following settings:
+
+        EXTENSIONS = {
+            "scrapy_loader_upkeep.extensions.RuleLatencyStats": 500,
+        }
+        UPKEEP_LATENCY_ENABLED = True
+    """
+
+    def __init__(self, stats, latencies=None):
+        self.stats = stats
+        self.latencies = RuleLatencies() if latencies is None else latencies
+
+        # These become the defaults of all of the loaders that don't explicitly
+        # set them themselves.
+        self.loader_defaults = LoaderDefaults(
+            track_latency=True, rule_latencies=self.latencies
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool("UPKEEP_LATENCY_ENABLED"):
+            raise NotConfigured
+
+        extension = cls(crawler.stats)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.loader_defaults.set()
+
+    def spider_closed(self, spider):
+        self.loader_defaults.restore()
+        self.latencies.dump(self.stats)
+
+
+class StatsSampling:
+    """Sets the 'stats_sample_rate' default of all of the loaders from the
+    UPKEEP_STATS_SAMPLE_RATE setting:
+
+        EXTENSIONS = {
+            "scrapy_loader_upkeep.extensions.StatsSampling": 500,
+        }
+        UPKEEP_STATS_SAMPLE_RATE = 0.1
+    """
+
+    def __init__(self, sample_rate):
+        self.sample_rate = sample_rate
+        self.loader_defaults = LoaderDefaults(stats_sample_rate=sample_rate)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        sample_rate = crawler.settings.getfloat("UPKEEP_STATS_SAMPLE_RATE", 1.0)
+        if not 0 < sample_rate < 1:
+            raise NotConfigured
+
+        extension = cls(sample_rate)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.loader_defaults.set()
+
+    def spider_closed(self, spider):
+        self.loader_defaults.restore()
+
+
+class RuleUsageReport:
+    """Counts the usage of every parser rule in a `RuleRegistry` and logs a
+    ranked report of the dead and rarely used rules when the spider is closed.
+
+        EXTENSIONS = {
+            "scrapy_loader_upkeep.extensions.RuleUsageReport": 500,
+        }
+        UPKEEP_RULE_REPORT_ENABLED = True
+        UPKEEP_RULE_REPORT_RARE_RATIO = 0.01  # the default
+
+    The number of rules in each status of the report is also added in the
+    stats, e.g. 'upkeep/rules/dead'.
+    """
+
+    def __init__(self, stats, registry=None, rare_ratio=0.01):
+        self.stats = stats
+        self.registry = RuleRegistry() if registry is None else registry
+        self.rare_ratio = rare_ratio
+        self.loader_defaults = LoaderDefaults(rule_registry=self.registry)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("UPKEEP_RULE_REPORT_ENABLED"):
+            raise NotConfigured
+
+        extension = cls(
+            crawler.stats,
+            registry=get_rule_registry(crawler),
+            rare_ratio=settings.getfloat("UPKEEP_RULE_REPORT_RARE_RATIO", 0.01),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.loader_defaults.set()
+
+    def spider_closed(self, spider):
+        self.loader_defaults.restore()
+        report = self.registry.report(rare_ratio=self.rare_ratio)
+
+        for status in ("dead", "skipped", "rare"):
+            self.stats.set_value(
+                f"upkeep/rules/{status}", sum(row[0] == status for row in report)
+            )
+
+        if not report:
+            logger.info("All of the %d parser rules are in use.", len(self.registry))
+            return
+
+        lines = [
+            f"{status.upper():<8} {label} (hits={hits}, missing={misses}, "
+            f"skipped={skips})"
+            for status, label, hits, misses, skips in report
+        ]
+        logger.info(
+            "%d of the %d parser rules might be obsolete:\n%s",
+            len(report),
+            len(self.registry),
+            "\n".join(lines),
+            extra={"spider": spider},
+        )
+
+
+class RuleUsageSnapshot:
+    """Writes the usage counts of every parser rule into a snapshot file when
+    the spider is closed, so that the snapshots of many crawler processes can
+    be merged afterwards with `scrapy_loader_upkeep.snapshots`:
+
+        EXTENSIONS = {
+            "scrapy_loader_upkeep.extensions.RuleUsageSnapshot": 500,
+        }
+        UPKEEP_SNAPSHOT_PATH = "snapshots/%(name)s-%(time)s-%(pid)s.jsonl.gz"
+
+    Like in the FEEDS setting, '%(name)s' and '%(time)s' are replaced by the
+    spider name and the time at which the spider was closed. '%(pid)s' can be
+    used to tell apart the processes that are closed at the same time.
+    """
+
+    def __init__(self, path, registry=None):
+        self.path = path
+        self.registry = RuleRegistry() if registry is None else registry
+        self.loader_defaults = LoaderDefaults(rule_registry=self.registry)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        path = crawler.settings.get("UPKEEP_SNAPSHOT_PATH")
+        if not path:
+            raise NotConfigured
+
+        extension = cls(path, registry=get_rule_registry(crawler))
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.loader_defaults.set()
+
+    def spider_closed(self, spider):
+        self.loader_defaults.restore()
+        closed = datetime.now(timezone.utc)
+        path = self.path % {
+            "name": spider.name,
+            "time": closed.strftime("%Y-%m-%dT%H-%M-%S"),
+            "pid": os.getpid(),
+        }
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        write_snapshot(
+            path,
+            registry_rules(self.registry),
+            spider=spider.name,
+            closed=closed.isoformat(),
+        )
+        logger.info(
+            "Wrote the usage of %d parser rules into %s",
+            len(self.registry),
+            path,
+            extra={"spider": spider},
+        )
+
+
+class OpenMetricsExporter:
+    """Serves the live evaluation counts of every parser rule in the OpenMetrics
+    format while the spider is running:
+
+        EXTENSIONS = {
+            "scrapy_loader_upkeep.extensions.OpenMetricsExporter": 500,
+        }
+        UPKEEP_METRICS_PORT = 9410
+        UPKEEP_METRICS_HOST = "127.0.0.1"  # the default
+        UPKEEP_METRICS_MAX_SERIES = 1000  # the default
+
+    which can then be scraped from 'http://127.0.0.1:9410/metrics'.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.loader_defaults = LoaderDefaults(rule_metrics=server.metrics)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        port = settings.get("UPKEEP_METRICS_PORT")
+        if port is None:
+            raise NotConfigured
+
+        server = MetricsServer(
+            RuleMetrics(max_series=settings.getint("UPKEEP_METRICS_MAX_SERIES", 1000)),
+            host=settings.get("UPKEEP_METRICS_HOST", "127.0.0.1"),
+            port=int(port),
+        )
+        extension = cls(server)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.loader_defaults.set()
+        self.server.start()
+        logger.info(
+            "Serving the parser rule metrics on http://%s:%d/metrics",
+            self.server.host,
+            self.server.port,
+            extra={"spider": spider},
+        )
+
+    def spider_closed(self, spider):
+        self.loader_defaults.restore()
+        self.server.stop()
+
+
+class ExtractionVolumeStats:
+    """Records the number of values and characters extracted by every parser
+    rule, and dumps them into the stats when the spider is closed:
+
+        EXTENSIONS = {
+            "scrapy_loader_upkeep.extensions.ExtractionVolumeStats": 500,
+        }
+        UPKEEP_VOLUME_ENABLED = True
+        UPKEEP_VOLUME_MAX_CHARS = 10000
+        UPKEEP_VOLUME_TRUNCATE = False  # the default
+
+    The rules that have extracted more than UPKEEP_VOLUME_MAX_CHARS characters
+    in a single evaluation are logged as a warning, and their number is added
+    in the 'upkeep/volume/over_budget_rules' stat. Their output is truncated to
+    the budget when UPKEEP_VOLUME_TRUNCATE is enabled.
+    """
+
+    def __init__(self, stats, volumes=None, max_chars=None, truncate=False):
+        self.stats = stats
+        self.volumes = RuleVolumes() if volumes is None else volumes
+        self.max_chars = max_chars
+        self.loader_defaults = LoaderDefaults(
+            track_volume=True,
+            rule_volumes=self.volumes,
+            volume_max_chars=max_chars,
+            volume_truncate=truncate,
+        )
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("UPKEEP_VOLUME_ENABLED"):
+            raise NotConfigured
+
+        extension = cls(
+            crawler.stats,
+            max_chars=settings.getint("UPKEEP_VOLUME_MAX_CHARS") or None,
+            truncate=settings.getbool("UPKEEP_VOLUME_TRUNCATE"),
+        )
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.loader_defaults.set()
+
+    def spider_closed(self, spider):
+        self.loader_defaults.restore()
+        self.volumes.dump(self.stats)
+        if self.max_chars is None:
+            return
+
+        over_budget = self.volumes.over_budget()
+        self.stats.set_value("upkeep/volume/over_budget_rules", len(over_budget))
+        if not over_budget:
+            return
+
+        lines = [
+            f"{label} (max_chars={volume.max_chars}, over_budget="
+            f"{volume.over_budget} of {volume.evaluations})"
+            for label, volume in over_budget
+        ]
+        logger.warning(
+            "%d parser rules have extracted more than %d characters:\n%s",
+            len(over_budget),
+            self.max_chars,
+            "\n".join(lines),
+            extra={"spider": spider},
+        )
+
+
+class RuleHitRateMonitor:
+    """Keeps the hit rates of every parser rule over time, and sends the
+    `rule_hit_rate_dropped` signal as soon as the hit rate of a rule falls
+    below a threshold in the middle of the crawl:
+
+        EXTENSIONS = {
+            "scrapy_loader_upkeep.extensions.RuleHitRateMonitor": 500,
+        }
+        UPKEEP_WINDOWS_ENABLED = True
+        UPKEEP_WINDOWS_BUCKET_SECONDS = 60  # the default
+        UPKEEP_WINDOWS_BUCKETS = 180  # the default
+        UPKEEP_WINDOWS_SPAN = 10  # the default, in buckets
+        UPKEEP_WINDOWS_THRESHOLD = 0.5  # the default
+        UPKEEP_WINDOWS_MIN_EVALUATIONS = 100  # the default
+
+    Each drop is also logged as a warning and counted in the
+    'upkeep/windows/drops' stat. See `RuleWindows` for the details.
+    """
+
+    def __init__(self, crawler, windows):
+        self.crawler = crawler
+        self.windows = windows
+        self.windows.hooks.append(self.hit_rate_dropped)
+        self.loader_defaults = LoaderDefaults(rule_windows=windows)
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool("UPKEEP_WINDOWS_ENABLED"):
+            raise NotConfigured
+
+        windows = RuleWindows(
+            bucket_seconds=settings.getfloat("UPKEEP_WINDOWS_BUCKET_SECONDS", 60),
+            buckets=settings.getint("UPKEEP_WINDOWS_BUCKETS", 180),
+            span=settings.getint("UPKEEP_WINDOWS_SPAN", 10),
+            threshold=settings.getfloat("UPKEEP_WINDOWS_THRESHOLD", 0.5),
+            min_evaluations=settings.getint("UPKEEP_WINDOWS_MIN_EVALUATIONS", 100),
+        )
+        extension = cls(crawler, windows)
+        crawler.signals.connect(extension.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extension.spider_closed, signal=signals.spider_closed)
+        return extension
+
+    def spider_opened(self, spider):
+        self.loader_defaults.set()
+
+    def spider_closed(self, spider):
+        self.loader_defaults.restore()
+
+    def hit_rate_dropped(self, parser_label, hit_rate, evaluations):
+        logger.warning(
+            "The hit rate of %s has dropped to %.1f%% over its last %d evaluations.",
+            parser_label,
+            hit_rate * 100,
+            evaluations,
+        )
+        self.crawler.stats.inc_value("upkeep/windows/drops")
+        self.crawler.signals.send_catch_log(
+            rule_hit_rate_dropped,
+            parser_label=parser_label,
+            hit_rate=hit_rate,
+            evaluations=evaluations,
+        )
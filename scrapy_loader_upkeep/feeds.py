@@ -0,0 +1,36 @@
+from io import BytesIO
+
+from lxml import etree
+from scrapy.http import Response
+
+
+def iter_records(source, tag):
+    """Yields every 'tag' element of the XML feed as soon as it's parsed,
+    without building the tree of the whole document.
+
+    The 'source' can be a file path, a file object, the bytes of the feed, or a
+    `Response`. Each element is cleared once the consumer is done with it,
+    along with the elements that came before it, so the memory used stays
+    roughly constant regardless of the size of the feed.
+    """
+
+    if isinstance(source, Response):
+        source = source.body
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+
+    for _, element in etree.iterparse(
+        source,
+        events=("end",),
+        tag=tag,
+        resolve_entities=False,
+        huge_tree=True,
+    ):
+        # The previous elements have been cleared already, but they're still
+        # referenced by their parent.
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+        yield element
+
+        element.clear(keep_tail=True)
@@ -0,0 +1,125 @@
+import json
+import threading
+import weakref
+from functools import partial
+
+try:
+    import jmespath
+except ImportError:
+    jmespath = None
+
+
+class JsonDocument:
+    """The decoded JSON of a response, or of one of its elements like a
+    <script> tag, which the JMESPath rules are evaluated against.
+    """
+
+    def __init__(self, data, cache=None):
+        self.data = data
+        self.cache = cache
+
+    def jmes(self, rule):
+        """Returns the list of values found by the JMESPath rule, which is empty
+        when nothing is found.
+        """
+
+        result = compile_jmes(rule, self.cache).search(self.data)
+        if result is None:
+            return []
+        if isinstance(result, list):
+            return result
+        return [result]
+
+
+class JsonDocuments:
+    """Caches the `JsonDocument`s of every response so that its JSON is only
+    decoded once, no matter how many fields and loaders use it.
+
+    The responses are weakly referenced so their documents are released along
+    with them.
+
+    It can be shared by loaders running in several threads. The JSON is decoded
+    without holding any lock, and the document is only added under one, so two
+    threads could both decode the same response but would share the document
+    of the first one.
+    """
+
+    def __init__(self):
+        self.documents = weakref.WeakKeyDictionary()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, owner, source, factory):
+        """Returns the document of the 'source' in 'owner', which is either a
+        response or a selector, calling 'factory()' to create it when needed.
+        """
+
+        try:
+            document = self.documents[owner][source]
+        except KeyError:
+            pass
+        else:
+            self.hits += 1
+            return document
+
+        document = factory()
+        with self.lock:
+            documents = self.documents.setdefault(owner, {})
+            try:
+                existing = documents[source]
+            except KeyError:
+                self.misses += 1
+                documents[source] = document
+                return document
+
+            self.hits += 1
+            return existing
+
+    def clear(self):
+        with self.lock:
+            self.documents.clear()
+            self.hits = self.misses = 0
+
+
+def compile_jmes(rule, cache=None):
+    """Returns the compiled JMESPath expression, which is shared by all of the
+    loaders through the `SelectorCache` when given.
+    """
+
+    if jmespath is None:
+        raise ImportError(
+            "The 'jmespath' package is required by the JMESPath rules, install "
+            "it with: pip install scrapy-loader-upkeep[jmes]"
+        )
+
+    if cache is None:
+        return jmespath.compile(rule)
+    return cache.lookup(("jmes", rule), partial(jmespath.compile, rule))
+
+
+def flatten_json(values):
+    """Returns the values with their nested lists flattened into them, while the
+    JSON objects are kept as single values instead of being iterated into
+    their keys.
+    """
+
+    flat = []
+    for value in values:
+        if isinstance(value, (list, tuple)):
+            flat.extend(flatten_json(value))
+        else:
+            flat.append(value)
+    return flat
+
+
+def decode_json(text):
+    """Decodes the JSON text, which is None when the source wasn't found."""
+
+    if text is None:
+        return None
+    return json.loads(text)
+
+
+# This is used by all of the ItemLoader instances by default.
+json_documents = JsonDocuments()
@@ -0,0 +1,84 @@
+from bisect import bisect_left
+
+# The upper bounds of the histogram buckets in microseconds, from 1us to ~8s.
+# Anything slower falls into an extra overflow bucket.
+BUCKETS = tuple(2**exponent for exponent in range(24))
+
+
+class LatencyHistogram:
+    """A fixed-bucket histogram of the time spent evaluating a parser rule.
+
+    Recording a duration is only a bisect and a few additions, which makes it
+    cheap enough to be left enabled in production. The percentiles are
+    estimated from the upper bound of the buckets.
+    """
+
+    __slots__ = ("counts", "count", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        micros = seconds * 1e6
+        self.counts[bisect_left(BUCKETS, micros)] += 1
+        self.count += 1
+        self.total += micros
+        if micros > self.max:
+            self.max = micros
+
+    def percentile(self, percent):
+        """Returns the estimated percentile in microseconds."""
+
+        if not self.count:
+            return 0.0
+
+        threshold = self.count * percent / 100
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative >= threshold:
+                break
+
+        if index == len(BUCKETS):
+            return self.max
+        return min(BUCKETS[index], self.max)
+
+
+class RuleLatencies:
+    """Keeps a `LatencyHistogram` for every parser rule stat label."""
+
+    def __init__(self):
+        self.histograms = {}
+
+    def observe(self, parser_label, seconds):
+        try:
+            histogram = self.histograms[parser_label]
+        except KeyError:
+            histogram = self.histograms[parser_label] = LatencyHistogram()
+        histogram.observe(seconds)
+
+    def dump(self, stats):
+        """Sets the summary of each histogram next to its parser rule stats:
+
+        'parser/SiteItemLoader/NAME/css/1/latency/p50_us': 16,
+        'parser/SiteItemLoader/NAME/css/1/latency/p95_us': 64,
+        'parser/SiteItemLoader/NAME/css/1/latency/max_us': 97,
+        'parser/SiteItemLoader/NAME/css/1/latency/total_us': 18453,
+        """
+
+        for parser_label, histogram in self.histograms.items():
+            prefix = f"{parser_label}/latency"
+            stats.set_value(f"{prefix}/p50_us", round(histogram.percentile(50)))
+            stats.set_value(f"{prefix}/p95_us", round(histogram.percentile(95)))
+            stats.set_value(f"{prefix}/max_us", round(histogram.max))
+            stats.set_value(f"{prefix}/total_us", round(histogram.total))
+
+    def clear(self):
+        self.histograms.clear()
+
+
+# This is shared by all of the ItemLoader instances by default.
+rule_latencies = RuleLatencies()
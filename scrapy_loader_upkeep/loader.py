@@ -1,10 +1,135 @@
+import sys
+import threading
+import time
+import zlib
 from collections import defaultdict
+from functools import partial
+
+from itemadapter import ItemAdapter
+from parsel import Selector, SelectorList
 from scrapy.loader import ItemLoader as ItemLoaderOG
 from scrapy.utils.misc import arg_to_iter
-from scrapy.utils.python import flatten
+
+from .adaptive import RuleHealth, rank
+from .bulk import BulkRows
+from .cache import selector_cache
+from .feeds import iter_records
+from .jmes import JsonDocument, decode_json, flatten_json, json_documents
+from .latency import rule_latencies
+from .memo import RuleMemo
+from .plan import compile_plan
+from .union import extract_union
+from .volume import rule_volumes, truncate_values
 
 
 class ItemLoader(ItemLoaderOG):
+
+    # When enabled, a list of fallback rules stops being evaluated as soon as
+    # one of them returns data. It can be overridden per call by passing the
+    # 'first_match' keyword to methods like `add_css()` and `add_xpath()`.
+    first_match = False
+
+    # The compiled css/xpath rules are shared across all of the instances. This
+    # can be set to None in order to use the selectors directly instead.
+    selector_cache = selector_cache
+
+    # The decoded JSON documents used by the JMESPath rules are cached per
+    # response in here. See `get_json_document()`.
+    json_documents = json_documents
+
+    # When enabled, a list of fallback rules is evaluated as a single union
+    # query. See `get_union_values()`.
+    union_fallbacks = False
+
+    # When enabled, the values of every rule are memoized while the item is
+    # being loaded, so a rule used by several fields, or by `get_css()` after
+    # `add_css()`, is only evaluated once. See `get_rule_evaluator()`.
+    memoize_rules = False
+
+    # When enabled, the time spent evaluating each rule is recorded into the
+    # histograms of `rule_latencies`. See the `RuleLatencyStats` extension.
+    track_latency = False
+    rule_latencies = rule_latencies
+
+    # When enabled, the number of values and characters extracted by each rule
+    # are recorded into `rule_volumes`. The rules whose output of a single
+    # evaluation exceeds 'volume_max_chars' are flagged, and their output is
+    # truncated when 'volume_truncate' is enabled as well. See the
+    # `ExtractionVolumeStats` extension.
+    track_volume = False
+    rule_volumes = rule_volumes
+    volume_max_chars = None
+    volume_truncate = False
+
+    # When enabled, the hit rate of every rule is learned during the crawl. The
+    # rules with the best rates are tried first in the 'first_match' mode, and
+    # the rules that have missed 'breaker_threshold' times in a row are only
+    # evaluated once every 'breaker_probe_interval' times from then on. The
+    # threshold can be set to None to keep evaluating them.
+    adaptive_fallbacks = False
+    breaker_threshold = 50
+    breaker_probe_interval = 100
+
+    # When set, the usage of every rule is also counted in this `RuleRegistry`,
+    # regardless of the stats. See the `RuleUsageReport` extension.
+    rule_registry = None
+
+    # When set, the evaluations of every rule are also counted in these
+    # `RuleMetrics`, to be served live. See the `OpenMetricsExporter` extension.
+    rule_metrics = None
+
+    # When set, the hits of every rule are also counted in the time buckets of
+    # these `RuleWindows`. See the `RuleHitRateMonitor` extension.
+    rule_windows = None
+
+    # When enabled, the stats are counted locally and are only pushed into the
+    # stats collector in one batch when `load_item()` is called.
+    buffered_stats = False
+
+    # The fraction of loaders, from 0 to 1, that record the stats when set. The
+    # loaders are picked deterministically by hashing the URL of the response.
+    # See `get_stats_weight()`.
+    stats_sample_rate = None
+
+    # The fields can be declared with `Rules` class attributes, or with a dict
+    # (or its JSON string) in 'extraction_plan', and then be loaded by calling
+    # `load()`. They're compiled into the '_plan' when the class is created.
+    # See `scrapy_loader_upkeep.plan.get_declared_fields()`.
+    extraction_plan = None
+    _plan = ()
+
+    # These are per loader class tables that are filled up as the crawl goes.
+    # They map the parts of the stat labels into their interned string, as well
+    # as the (field_name, selector_type) pairs into compact integer keys for
+    # the 'field_tracker'. See `__init_subclass__()`.
+    _stat_labels = {}
+    _tracker_keys = {}
+
+    # Guards the allocation of new keys in the '_tracker_keys' of every class,
+    # since two threads could otherwise hand out the same integer.
+    _tracker_keys_lock = threading.Lock()
+
+    # The `RuleHealth` of every rule when using 'adaptive_fallbacks', keyed by
+    # (field_name, selector_type, position, name).
+    _rule_health = {}
+
+    # The labels of the rules that have produced data at least once, which is
+    # only kept up to date when sampling the stats.
+    _observed_hits = set()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._stat_labels = {}
+        cls._tracker_keys = {}
+        cls._rule_health = {}
+        cls._observed_hits = set()
+
+        # The labels are only precomputed when they're built from the class
+        # name, since the 'loader_name' can be overridden per instance.
+        cls._plan = compile_plan(
+            cls, precompute_labels=cls.loader_name is ItemLoader.loader_name
+        )
+
     def __init__(
         self,
         item=None,
@@ -22,21 +147,205 @@ class ItemLoader(ItemLoaderOG):
             item=item, selector=selector, response=response, parent=parent, **context
         )
 
-        # This is the new injected dependency that we'll be using as the main
-        # functionality of this tool.
-        self.stats = stats
+        # The loaders created by `nested_css()` and `nested_xpath()` share the
+        # stats, the position tracker, the buffer and the sampling decision of
+        # their parent, so that their rules are logged as if they were loaded
+        # by the parent itself.
+        if isinstance(parent, ItemLoader):
+            self.stats = parent.stats if stats is None else stats
+            self.field_tracker = parent.field_tracker
+            self.stats_buffer = parent.stats_buffer
+            self.stats_weight = parent.stats_weight
+        else:
+            # This is the new injected dependency that we'll be using as the
+            # main functionality of this tool.
+            self.stats = stats
+
+            # This keeps track of the position of the 'field' name that is
+            # being loaded for a more accurate logging in the stats. It's keyed
+            # by the integers from `get_tracker_key()`.
+            self.field_tracker = defaultdict(int)
+
+            # Holds the stats of the current item when using 'buffered_stats'.
+            self.stats_buffer = defaultdict(int) if self.buffered_stats else None
+
+            # How much each stat increment counts for, which is None when this
+            # loader hasn't been picked when sampling the stats.
+            self.stats_weight = self.get_stats_weight()
+
+        # These are set by `load_items()` for the loader of each row.
+        self.bulk_rows = None
+        self.row_index = None
+
+        # The nested loaders share the `RuleMemo` of their parent when using
+        # 'memoize_rules' since their selectors come from the same document.
+        self.rule_memo = None
+        if self.memoize_rules:
+            self.rule_memo = getattr(parent, "rule_memo", None)
+            if self.rule_memo is None:
+                self.rule_memo = RuleMemo()
+
+    @classmethod
+    def load_items(
+        cls,
+        response=None,
+        populate=None,
+        row_css=None,
+        row_xpath=None,
+        selector=None,
+        **kwargs,
+    ):
+        """Yields an item for each of the rows matched by either 'row_css' or
+        'row_xpath', which is the bulk equivalent of:
+
+            for row in response.css(row_css):
+                loader = cls(selector=row, **kwargs)
+                populate(loader)
+                yield loader.load_item()
+
+        Instead of evaluating every rule once per row, each of them is only
+        evaluated once against the whole document and the results are split
+        back to their rows. The stats logged for each row stay the same.
+
+        When 'populate' isn't given, each row is loaded with `load()` from the
+        fields declared in the loader class instead.
+        """
+
+        if selector is None:
+            selector = cls.default_selector_class(response)
+
+        bulk_rows = BulkRows.from_selector(
+            selector, row_css=row_css, row_xpath=row_xpath, cache=cls.selector_cache
+        )
+
+        # A single loader is reset for every row instead of creating new ones.
+        loader = None
+        for index, row in enumerate(bulk_rows.rows):
+            if loader is None:
+                loader = cls(selector=row, response=response, **kwargs)
+            else:
+                loader.reset(selector=row, response=response, item=kwargs.get("item"))
+            loader.bulk_rows = bulk_rows
+            loader.row_index = index
+            if populate is None:
+                yield loader.load()
+            else:
+                populate(loader)
+                yield loader.load_item()
+
+    @classmethod
+    def load_feed(cls, source, tag, populate=None, namespaces=None, **kwargs):
+        """Yields an item for each of the 'tag' elements of an XML feed, which
+        works the same way as:
+
+            for record in Selector(response).xpath(f"//{tag}"):
+                loader = cls(selector=record, **kwargs)
+                populate(loader)
+                yield loader.load_item()
+
+        but the feed is parsed incrementally instead, and each element is
+        released once its item is loaded. See `feeds.iter_records()` for the
+        supported sources.
+
+        The rules are evaluated against each element of the partially parsed
+        document, so they must be relative to it, like 'title::text' or
+        './title/text()', instead of absolute ones like '//title/text()'.
+        """
+
+        loader = None
+        for element in iter_records(source, tag):
+            selector = Selector(root=element, type="xml", namespaces=namespaces)
+            if loader is None:
+                loader = cls(selector=selector, **kwargs)
+            else:
+                loader.reset(
+                    selector=selector,
+                    response=kwargs.get("response"),
+                    item=kwargs.get("item"),
+                )
+            if populate is None:
+                yield loader.load()
+            else:
+                populate(loader)
+                yield loader.load_item()
 
-        # This keeps track of the position of the 'field' name that is being
-        # loaded for a more accurate logging in the stats.
-        self.field_tracker = defaultdict(int)
+    def reset(self, selector=None, response=None, item=None):
+        """Clears the state of the loaded item so that the loader can be reused
+        for another one, which behaves the same as creating a new loader with
+        the same stats and context:
+
+            loader = QuotesItemLoader(stats=self.crawler.stats)
+            for quote_div in response.css("div.quote"):
+                loader.reset(selector=quote_div)
+                loader.add_css("author", ".author::text")
+                yield loader.load_item()
+
+        The existing containers are cleared instead of being allocated again,
+        which adds up on pages with hundreds of rows. The nested loaders can't
+        be reset by themselves, but they can be created again from their reset
+        parent.
+        """
+
+        if self.parent is not None:
+            raise RuntimeError("The nested loaders can't be reset, only their parent.")
+
+        if selector is None and response is not None:
+            try:
+                selector = self.default_selector_class(response)
+            except AttributeError:
+                selector = None
+
+        self.selector = selector
+        self.context["selector"] = selector
+        self.context["response"] = response
+
+        # This mirrors the item handling of the parent's `__init__()`.
+        self._local_values.clear()
+        if item is None:
+            item = self.default_item_class()
+        else:
+            for field_name, value in ItemAdapter(item).items():
+                self._local_values.setdefault(field_name, [])
+                self._local_values[field_name] += arg_to_iter(value)
+        self._local_item = self.context["item"] = item
+
+        self.field_tracker.clear()
+        if self.stats_buffer is not None:
+            self.stats_buffer.clear()
+        self.stats_weight = self.get_stats_weight()
+        self.bulk_rows = None
+        self.row_index = None
+        if self.rule_memo is not None:
+            self.rule_memo.clear()
+        return self
+
+    def load(self):
+        """Adds all of the rules declared on the loader class, in the order that
+        they were declared, and returns the loaded item.
+        """
+
+        for field_name, selector_type, selector_rules, kw in self._plan:
+            if selector_type == "css":
+                self.add_css(field_name, selector_rules, **kw)
+            else:
+                self.add_xpath(field_name, selector_rules, **kw)
+        return self.load_item()
+
+    def load_item(self):
+        item = super(ItemLoader, self).load_item()
+        self.flush_stats()
+        self.release_memo()
+        return item
 
     # The methods below have been overridden from their parent to pass the
     # 'field_name' variable into `_get_xpathvalues()` and `_get_cssvalues()`
 
     def add_xpath(self, field_name, xpath, *processors, **kw):
-        self.field_tracker[f"{field_name}_xpath"] += 1
+        xpath = get_rule_list(xpath)
+        self.field_tracker[self.get_tracker_key(field_name, "xpath")] += 1
         values = self._get_xpathvalues(field_name, xpath, **kw)
         self.add_value(field_name, values, *processors, **kw)
+        self.skip_positions(field_name, "xpath", xpath)
 
     def replace_xpath(self, field_name, xpath, *processors, **kw):
         values = self._get_xpathvalues(field_name, xpath, **kw)
@@ -47,9 +356,11 @@ class ItemLoader(ItemLoaderOG):
         return self.get_value(values, *processors, **kw)
 
     def add_css(self, field_name, css, *processors, **kw):
-        self.field_tracker[f"{field_name}_css"] += 1
+        css = get_rule_list(css)
+        self.field_tracker[self.get_tracker_key(field_name, "css")] += 1
         values = self._get_cssvalues(field_name, css, **kw)
         self.add_value(field_name, values, *processors, **kw)
+        self.skip_positions(field_name, "css", css)
 
     def replace_css(self, field_name, css, *processors, **kw):
         values = self._get_cssvalues(field_name, css, **kw)
@@ -59,6 +370,26 @@ class ItemLoader(ItemLoaderOG):
         values = self._get_cssvalues(None, css, **kw)
         return self.get_value(values, *processors, **kw)
 
+    # The methods below evaluate JMESPath rules against the JSON of the response,
+    # or against the JSON inside the element matched by the 'source' css rule:
+    #
+    #   loader.add_jmes("price", ["offers.price", "price"], source="#data::text")
+
+    def add_jmes(self, field_name, jmes, *processors, **kw):
+        jmes = get_rule_list(jmes)
+        self.field_tracker[self.get_tracker_key(field_name, "jmes")] += 1
+        values = self._get_jmesvalues(field_name, jmes, **kw)
+        self.add_value(field_name, values, *processors, **kw)
+        self.skip_positions(field_name, "jmes", jmes)
+
+    def replace_jmes(self, field_name, jmes, *processors, **kw):
+        values = self._get_jmesvalues(field_name, jmes, **kw)
+        self.replace_value(field_name, values, *processors, **kw)
+
+    def get_jmes(self, jmes, *processors, **kw):
+        values = self._get_jmesvalues(None, jmes, **kw)
+        return self.get_value(values, *processors, **kw)
+
     # The methods below are overridden and have been refactored for integration
     # of stat logging.
 
@@ -68,11 +399,28 @@ class ItemLoader(ItemLoaderOG):
     def _get_cssvalues(self, field_name, csss, **kw):
         return self.get_selector_values(field_name, csss, self.selector.css, **kw)
 
+    def _get_jmesvalues(self, field_name, jmess, **kw):
+        document = self.get_json_document(kw.get("source"))
+        return self.get_selector_values(field_name, jmess, document.jmes, **kw)
+
     # The methods below are unique to this class and are not present in the parent.
 
     def get_selector_values(self, field_name, selector_rules, selector, **kw):
         """Provides an abstraction to _get_xpathvalues() and _get_cssvalues()
         since they share the same components.
+
+        When running in 'first_match' mode, the rules following the first one
+        that has produced some data aren't evaluated at all. They are still
+        logged in the stats as '*/skipped' so they're not mistaken as dead.
+
+        In the 'adaptive_fallbacks' mode, the rules can be evaluated in a
+        different order and the tripped ones are logged as '*/suppressed'
+        instead of being evaluated. The stats are always logged under the
+        position in which the rules were declared.
+
+        The loaders that weren't picked when sampling the stats only extract
+        the values, and check whether each rule has produced data before. See
+        `write_first_hit()`.
         """
 
         self._check_selector_method()
@@ -84,19 +432,242 @@ class ItemLoader(ItemLoaderOG):
 
         # For every call of `add_css()` and `add_xpath()` this is incremented.
         # We'll use it as the base index of the position of the logged stats.
-        index = self.field_tracker[f"{field_name}_{selector_type}"]
+        tracker_key = self.get_tracker_key(field_name, selector_type)
+        index = self.field_tracker[tracker_key]
 
+        first_match = kw.get("first_match")
+        if first_match is None:
+            first_match = self.first_match
+
+        selector_rules = get_rule_list(selector_rules)
+
+        union_values = self.get_union_values(
+            selector, selector_rules, first_match=first_match
+        )
+        evaluate = self.get_rule_evaluator(selector)
+
+        order = range(len(selector_rules))
+        healths = None
+        if self.adaptive_fallbacks and field_name:
+            healths = [
+                self.get_rule_health(field_name, selector_type, position, name)
+                for position in range(index, index + len(selector_rules))
+            ]
+            if first_match:
+                order = rank(healths)
+
+        # The values of every rule are added to a single list as they're
+        # evaluated. The css and xpath rules always produce flat lists of
+        # strings, so only the nested lists in the values of the other rules,
+        # like the JMESPath ones, are flattened on their way in.
+        flat = selector_type in ("css", "xpath")
+        sampled = self.stats_weight is not None
         values = []
-        for position, rule in enumerate(arg_to_iter(selector_rules), index):
-            parsed_data = selector(rule).getall()
-            values.append(parsed_data)
-            self.write_to_stats(
-                field_name, parsed_data, position, selector_type, name=name
+        matched = False
+        for offset in order:
+            position = index + offset
+            rule = selector_rules[offset]
+
+            if matched:
+                if sampled:
+                    self.write_to_stats(
+                        field_name,
+                        None,
+                        position,
+                        selector_type,
+                        name=name,
+                        skipped=True,
+                    )
+                continue
+
+            if healths is not None and not healths[offset].allow(
+                self.breaker_threshold, self.breaker_probe_interval
+            ):
+                if sampled:
+                    self.write_to_stats(
+                        field_name,
+                        None,
+                        position,
+                        selector_type,
+                        name=name,
+                        suppressed=True,
+                    )
+                continue
+
+            if union_values is not None:
+                parsed_data = union_values[offset]
+            elif self.track_latency and field_name and sampled:
+                start = time.perf_counter()
+                parsed_data = evaluate(rule)
+                self.rule_latencies.observe(
+                    self.get_stat_label(
+                        field_name, selector_type, position, name, None
+                    ),
+                    time.perf_counter() - start,
+                )
+            else:
+                parsed_data = evaluate(rule)
+
+            if self.track_volume and field_name:
+                if sampled:
+                    parsed_data = self.rule_volumes.observe(
+                        self.get_stat_label(
+                            field_name, selector_type, position, name, None
+                        ),
+                        parsed_data,
+                        max_chars=self.volume_max_chars,
+                        truncate=self.volume_truncate,
+                    )
+                elif self.volume_truncate and self.volume_max_chars is not None:
+                    parsed_data = truncate_values(parsed_data, self.volume_max_chars)
+
+            if flat:
+                values.extend(parsed_data)
+            else:
+                values.extend(flatten_json(parsed_data))
+            if sampled:
+                self.write_to_stats(
+                    field_name, parsed_data, position, selector_type, name=name
+                )
+            elif parsed_data not in (None, []):
+                self.write_first_hit(
+                    field_name, parsed_data, position, selector_type, name=name
+                )
+            matched = first_match and bool(parsed_data)
+            if healths is not None:
+                healths[offset].record(bool(parsed_data))
+
+        return values
+
+    def skip_positions(self, field_name, selector_type, selector_rules):
+        """Multiple rules in a single call of methods like `add_css()` occupy
+        multiple positions, so the next call must continue from the last one.
+
+        The methods like `replace_css()` don't move the position at all.
+        """
+
+        if len(selector_rules) > 1:
+            tracker_key = self.get_tracker_key(field_name, selector_type)
+            self.field_tracker[tracker_key] += len(selector_rules) - 1
+
+    def get_json_document(self, source=None):
+        """Returns the `JsonDocument` of the response's body, or of the text
+        matched by the 'source' css rule, which is decoded only once per
+        response.
+
+        The 'source' is matched against the whole response, even in the nested
+        loaders, so that all of the loaders of the response share its document.
+        When it doesn't match anything, the JMESPath rules evaluated against it
+        are all logged as '*/missing'.
+        """
+
+        self._check_selector_method()
+
+        response = self.context.get("response")
+        if source is None and response is None:
+            raise ValueError(
+                "A 'source' css rule is required by the JMESPath rules when the "
+                "loader has no response."
             )
-        return flatten(values)
+
+        owner = self.selector if response is None else response
+
+        def factory():
+            if source is None:
+                text = response.text
+            elif response is None:
+                text = self.selector.css(source).get()
+            else:
+                text = response.selector.css(source).get()
+            return JsonDocument(decode_json(text), cache=self.selector_cache)
+
+        if self.json_documents is None:
+            return factory()
+        return self.json_documents.get(owner, source, factory)
+
+    def get_rule_health(self, field_name, selector_type, position, name):
+        """Returns the `RuleHealth` of the rule from the loader class' table,
+        which is shared by all of its instances.
+        """
+
+        key = (field_name, selector_type, position, name)
+        try:
+            return self._rule_health[key]
+        except KeyError:
+            health = self._rule_health[key] = RuleHealth()
+            return health
+
+    def get_union_values(self, selector, selector_rules, first_match=False):
+        """Evaluates all of the fallback rules as a single union query when
+        'union_fallbacks' is enabled, returning the values of each rule.
+
+        None is returned when the rules should be evaluated one by one instead,
+        like when there's only a single rule or when some of them don't match
+        elements (e.g. '::text' or '@href'). This is also the case in the
+        'first_match' and 'adaptive_fallbacks' modes, which avoid evaluating
+        the rules after a match or the tripped ones, while the union would
+        evaluate all of them anyway.
+        """
+
+        if (
+            not self.union_fallbacks
+            or first_match
+            or self.adaptive_fallbacks
+            or len(selector_rules) < 2
+            or self.selector_cache is None
+            or self.bulk_rows is not None
+        ):
+            return None
+
+        target = getattr(selector, "__self__", None)
+        if not isinstance(target, (Selector, SelectorList)):
+            return None
+
+        return extract_union(
+            self.selector_cache, target, selector.__name__, selector_rules
+        )
+
+    def get_rule_evaluator(self, selector):
+        """Returns a callable that extracts all of the data of a single rule.
+
+        The compiled rules from the `selector_cache` are used when the given
+        selector method belongs to a parsel selector. Otherwise, it falls back
+        to calling `selector(rule).getall()`. The loaders created by
+        `load_items()` get the results of their row from the bulk evaluation.
+
+        When using 'memoize_rules', the values are looked up in the `RuleMemo`
+        first.
+        """
+
+        target = getattr(selector, "__self__", None)
+        if isinstance(target, JsonDocument):
+            evaluate = target.jmes
+        elif self.bulk_rows is not None and target is self.selector:
+            evaluate = partial(
+                self.bulk_rows.extract, self.row_index, selector.__name__
+            )
+        elif self.selector_cache is None or not isinstance(
+            target, (Selector, SelectorList)
+        ):
+            evaluate = lambda rule: selector(rule).getall()  # noqa: E731
+        else:
+            evaluate = partial(self.selector_cache.extract, target, selector.__name__)
+
+        if self.rule_memo is not None and target is not None:
+            evaluate = partial(
+                self.rule_memo.extract, target, selector.__name__, evaluate
+            )
+        return evaluate
 
     def write_to_stats(
-        self, field_name, parsed_data, position, selector_type, name=None
+        self,
+        field_name,
+        parsed_data,
+        position,
+        selector_type,
+        name=None,
+        skipped=False,
+        suppressed=False,
     ):
         """Responsible for logging the parser rules usage.
 
@@ -109,23 +680,271 @@ class ItemLoader(ItemLoaderOG):
         to the stat is clunky, but necessary. With this, we can only surmise
         that it's safe to remove parser fallback parser if it's all just
         '*/missing' in the stats.
+
+        Rules that weren't evaluated at all because of the 'first_match' mode
+        are logged as '*/skipped' instead, while the ones tripped in the
+        'adaptive_fallbacks' mode are logged as '*/suppressed'.
+
+        When sampling the stats, each increment is weighted by the inverse of the
+        'stats_sample_rate' so the stats are estimates of the actual counts,
+        with the number of samples behind them logged as '*/samples'. The
+        loaders that weren't picked don't log anything here, see
+        `write_first_hit()` instead.
         """
 
+        if self.stats_weight is None:
+            if parsed_data not in (None, []) and not skipped and not suppressed:
+                self.write_first_hit(
+                    field_name, parsed_data, position, selector_type, name=name
+                )
+            return
+
+        if field_name and self.rule_registry is not None:
+            rule_id = self.rule_registry.get_id(
+                self.loader_name, field_name, selector_type, position, name
+            )
+            self.rule_registry.record(
+                rule_id, parsed_data, skipped=skipped or suppressed
+            )
+
+        if skipped:
+            status = "skipped"
+        elif suppressed:
+            status = "suppressed"
+        elif parsed_data in (None, []):
+            status = "missing"
+        else:
+            status = None
+
+        if field_name and self.rule_metrics is not None:
+            self.rule_metrics.record(
+                self.loader_name,
+                field_name,
+                selector_type,
+                position,
+                name,
+                status or "hit",
+            )
+
+        if (
+            field_name
+            and self.rule_windows is not None
+            and not skipped
+            and not suppressed
+        ):
+            self.rule_windows.record(
+                self.get_stat_label(field_name, selector_type, position, name, None),
+                status is None,
+            )
+
         if not self.stats or not field_name:
             return
 
-        parser_label = (
-            f"parser/{self.loader_name}/{field_name}/{selector_type}/{position}"
+        parser_label = self.get_stat_label(
+            field_name, selector_type, position, name, status
+        )
+
+        if self.stats_weight == 1:
+            self.inc_stat(parser_label, 1)
+            return
+
+        if status is None:
+            self._observed_hits.add(parser_label)
+
+        self.inc_stat(parser_label, self.stats_weight)
+        self.inc_stat(
+            self.get_stat_label(
+                field_name,
+                selector_type,
+                position,
+                name,
+                f"{status}/samples" if status else "samples",
+            ),
+            1,
+        )
+
+    def write_first_hit(
+        self, field_name, parsed_data, position, selector_type, name=None
+    ):
+        """Logs the first data produced by a rule in the loaders that weren't
+        picked when sampling the stats, as '*/observed'.
+
+        This is only done when none of the loaders of the class have seen the
+        rule producing data before, so the rules that only have '*/missing'
+        stats are still reported exactly. It's kept apart from the estimated
+        count of the rule, which only comes from the sampled loaders.
+
+        The hit is recorded in the 'rule_registry' as well when it hasn't got
+        any yet, so the rule isn't reported as dead by the `RuleUsageReport`.
+        """
+
+        if not field_name:
+            return
+
+        if self.rule_registry is not None:
+            rule_id = self.rule_registry.get_id(
+                self.loader_name, field_name, selector_type, position, name
+            )
+            if not self.rule_registry.hits[rule_id]:
+                self.rule_registry.record(rule_id, parsed_data)
+
+        if not self.stats:
+            return
+
+        parser_label = self.get_stat_label(
+            field_name, selector_type, position, name, None
         )
+        if parser_label in self._observed_hits:
+            return
+
+        self._observed_hits.add(parser_label)
+        self.inc_stat(
+            self.get_stat_label(field_name, selector_type, position, name, "observed"),
+            1,
+        )
+
+    def inc_stat(self, parser_label, count):
+        if self.stats_buffer is not None:
+            self.stats_buffer[parser_label] += count
+        elif count == 1:
+            self.stats.inc_value(parser_label)
+        else:
+            self.stats.inc_value(parser_label, count)
+
+    def get_stats_weight(self):
+        """Decides whether this loader records the stats when sampling them,
+        returning the weight of each stat increment or None if it doesn't.
+
+        The decision is made by hashing the URL of the response, or the base
+        URL of the selector's document, so that all of the loaders for the same
+        page are either sampled or not. The ones without any URL are always
+        sampled, although with a weight of 1.
+        """
+
+        rate = self.stats_sample_rate
+        if rate is None or rate >= 1:
+            return 1
+
+        url = getattr(self.context.get("response"), "url", None)
+        if url is None:
+            url = getattr(getattr(self.selector, "root", None), "base", None)
+        if url is None:
+            return 1
+
+        if zlib.crc32(url.encode("utf-8")) < rate * 2**32:
+            return 1 / rate
+        return None
+
+    def flush_stats(self):
+        """Pushes the stats counted when using 'buffered_stats' into the stats
+        collector.
+
+        A `StatsBuffer` receives them all in a single call while the other
+        stats collectors get one call for each of the distinct stat labels.
+        """
+
+        if not self.stats_buffer:
+            return
+
+        inc_values = getattr(self.stats, "inc_values", None)
+        if inc_values is not None:
+            inc_values(self.stats_buffer)
+        else:
+            for parser_label, count in self.stats_buffer.items():
+                self.stats.inc_value(parser_label, count)
+
+        self.stats_buffer.clear()
+
+    def release_memo(self):
+        """Releases the values memoized when using 'memoize_rules', adding the
+        number of rules that were looked up in the memo into the stats:
+
+            'upkeep/memo/hits': 12,
+            'upkeep/memo/misses': 30,
+        """
+
+        if self.rule_memo is None:
+            return
+
+        if self.stats:
+            if self.rule_memo.hits:
+                self.stats.inc_value("upkeep/memo/hits", self.rule_memo.hits)
+            if self.rule_memo.misses:
+                self.stats.inc_value("upkeep/memo/misses", self.rule_memo.misses)
+
+        self.rule_memo.clear()
+
+    def get_stat_label(self, field_name, selector_type, position, name, status):
+        """Returns the interned stat label from the loader class' table, only
+        building it the first time it's encountered.
+        """
+
+        loader_name = self.loader_name
+        try:
+            return self._stat_labels[
+                loader_name, field_name, selector_type, position, name, status
+            ]
+        except KeyError:
+            return self.build_stat_label(
+                field_name,
+                selector_type,
+                position,
+                name,
+                status,
+                loader_name=loader_name,
+            )
+
+    @classmethod
+    def build_stat_label(
+        cls, field_name, selector_type, position, name, status, loader_name=None
+    ):
+        """Builds the stat label and interns it into the loader class' table,
+        where it's keyed by the 'loader_name' too since it can be overridden
+        per instance.
+        """
+
+        if loader_name is None:
+            loader_name = cls.__name__
+
+        parser_label = f"parser/{loader_name}/{field_name}/{selector_type}/{position}"
 
         if name:
             parser_label += f"/{name}"
 
-        if parsed_data in (None, []):
-            parser_label += "/missing"
+        if status:
+            parser_label += f"/{status}"
+
+        key = (loader_name, field_name, selector_type, position, name, status)
+        parser_label = cls._stat_labels[key] = sys.intern(parser_label)
+        return parser_label
 
-        self.stats.inc_value(parser_label)
+    @classmethod
+    def get_tracker_key(cls, field_name, selector_type):
+        """Returns the compact integer key of the given field and selector type
+        to be used in the 'field_tracker'.
+        """
+
+        key = (field_name, selector_type)
+        try:
+            return cls._tracker_keys[key]
+        except KeyError:
+            pass
+
+        with cls._tracker_keys_lock:
+            tracker_key = cls._tracker_keys.get(key)
+            if tracker_key is None:
+                tracker_key = cls._tracker_keys[key] = len(cls._tracker_keys)
+            return tracker_key
 
     @property
     def loader_name(self):
         return self.__class__.__name__
+
+
+def get_rule_list(selector_rules):
+    """Returns the rule, or the iterable of rules, as a list or a tuple."""
+
+    selector_rules = arg_to_iter(selector_rules)
+    if not isinstance(selector_rules, (list, tuple)):
+        selector_rules = list(selector_rules)
+    return selector_rules
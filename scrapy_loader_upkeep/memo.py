@@ -0,0 +1,38 @@
+class RuleMemo:
+    """Memoizes the values extracted by each (selector, rule_type, rule) while
+    an item is being loaded.
+
+    The selectors are keyed by their `id()` since a `SelectorList` isn't
+    hashable. A reference to the selector is kept with its values so that the
+    `id()` of a garbage collected selector being reused can't be mistaken for
+    a hit.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def extract(self, selector, rule_type, evaluate, rule):
+        """Returns the values of the rule, only calling `evaluate(rule)` the
+        first time it's encountered for the given selector.
+        """
+
+        key = (id(selector), rule_type, rule)
+        entry = self.entries.get(key)
+        if entry is not None and entry[0] is selector:
+            self.hits += 1
+            return entry[1]
+
+        values = evaluate(rule)
+        self.entries[key] = (selector, values)
+        self.misses += 1
+        return values
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = 0
+        self.misses = 0
@@ -0,0 +1,130 @@
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+
+CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+LABELS = ("loader", "field", "type", "position", "name", "status")
+
+
+class RuleMetrics:
+    """Counts the evaluations of every parser rule by their status, which are
+    'hit', 'missing', 'skipped' or 'suppressed', to be rendered in the
+    OpenMetrics text format.
+
+    Since the 'name' of the rules is free-form, the number of series is capped
+    at 'max_series'. The increments of any series beyond that are dropped and
+    counted in 'upkeep_parser_rule_dropped_total' instead, so the memory used
+    stays bounded no matter how the loaders are used.
+    """
+
+    def __init__(self, max_series=1000):
+        self.max_series = max_series
+        self.counters = {}
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.counters)
+
+    def record(self, loader_name, field_name, selector_type, position, name, status):
+        key = (loader_name, field_name, selector_type, position, name, status)
+        count = self.counters.get(key)
+        if count is not None:
+            self.counters[key] = count + 1
+        elif len(self.counters) < self.max_series:
+            self.counters[key] = 1
+        else:
+            self.dropped += 1
+
+    def render(self):
+        """Returns the counters in the OpenMetrics text format.
+
+        This is called from the thread of the HTTP server, so the counters are
+        copied first while the loaders keep on incrementing them.
+        """
+
+        counters = list(self.counters.items())
+
+        lines = [
+            "# TYPE upkeep_parser_rule counter",
+            "# HELP upkeep_parser_rule The evaluations of the parser rules.",
+        ]
+        for key, count in counters:
+            labels = ",".join(
+                f'{label}="{escape(value)}"'
+                for label, value in zip(LABELS, key)
+                if value is not None
+            )
+            lines.append(f"upkeep_parser_rule_total{{{labels}}} {count}")
+
+        lines += [
+            "# TYPE upkeep_parser_rule_dropped counter",
+            "# HELP upkeep_parser_rule_dropped The evaluations of the parser rules "
+            "beyond the limit of series.",
+            f"upkeep_parser_rule_dropped_total {self.dropped}",
+            "# EOF",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def clear(self):
+        self.counters.clear()
+        self.dropped = 0
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+class MetricsServer:
+    """Serves the `RuleMetrics` on 'http://host:port/metrics' in a daemon
+    thread, so scraping them never blocks the reactor.
+    """
+
+    def __init__(self, metrics, host="127.0.0.1", port=9410):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        metrics = self.metrics
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+
+                body = metrics.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stops the server without waiting for its polling loop to exit."""
+
+        if self.server is None:
+            return
+
+        server, self.server = self.server, None
+
+        def shutdown():
+            server.shutdown()
+            server.server_close()
+
+        threading.Thread(target=shutdown, daemon=True).start()
@@ -0,0 +1,200 @@
+import json
+from collections import defaultdict
+
+from cssselect import SelectorError
+
+from .cache import TRANSLATORS, compile_rule
+
+RULE_TYPES = ("css", "xpath")
+
+# The statuses of the stat labels that are precomputed for every rule.
+STATUSES = (None, "missing", "skipped")
+
+
+class Rules:
+    """Declares the rules of a field on an ItemLoader subclass, where each of
+    them is the equivalent of an `add_css()` or `add_xpath()` call:
+
+        class QuotesItemLoader(ItemLoader):
+            quote = Rules(css=[".quote > .text::text", ".quote .text::text"])
+            author = Rules(css=".author::text", name="author", first_match=True)
+
+    When both 'css' and 'xpath' are given, the css rules are added first.
+    """
+
+    def __init__(self, css=None, xpath=None, name=None, first_match=None):
+        if css is None and xpath is None:
+            raise ValueError("Either the 'css' or 'xpath' rules must be given.")
+
+        self.css = validate_rules("css", css)
+        self.xpath = validate_rules("xpath", xpath)
+
+        if name is not None and not isinstance(name, str):
+            raise ValueError(f"The 'name' must be a string, not {name!r}.")
+        if first_match is not None and not isinstance(first_match, bool):
+            raise ValueError(f"The 'first_match' must be a bool, not {first_match!r}.")
+
+        self.name = name
+        self.first_match = first_match
+
+    def __repr__(self):
+        return (
+            f"Rules(css={self.css!r}, xpath={self.xpath!r}, name={self.name!r}, "
+            f"first_match={self.first_match!r})"
+        )
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Creates the rules from a dict like {"css": [...], "name": "..."}."""
+
+        if not isinstance(spec, dict):
+            raise ValueError(f"The rules must be declared in a dict, not {spec!r}.")
+
+        unknown = set(spec) - {"css", "xpath", "name", "first_match"}
+        if unknown:
+            raise ValueError(f"Unknown keys in the rules: {sorted(unknown)}")
+
+        return cls(**spec)
+
+    def get_kwargs(self):
+        kw = {}
+        if self.name is not None:
+            kw["name"] = self.name
+        if self.first_match is not None:
+            kw["first_match"] = self.first_match
+        return kw
+
+
+def validate_rules(rule_type, rules):
+    if rules is None:
+        return None
+    if isinstance(rules, str):
+        rules = (rules,)
+    if (
+        not isinstance(rules, (list, tuple))
+        or not rules
+        or not all(isinstance(rule, str) for rule in rules)
+    ):
+        raise ValueError(
+            f"The '{rule_type}' rules must be a string or a non-empty list of "
+            f"strings, not {rules!r}."
+        )
+    return tuple(rules)
+
+
+def get_declared_fields(loader_cls):
+    """Returns the {field_name: [Rules, ...]} declared on the loader class, in
+    the order in which they were declared.
+
+    The `Rules` class attributes come first, including the inherited ones,
+    followed by the fields of the 'extraction_plan' spec which can either be a
+    dict or its JSON string:
+
+        extraction_plan = {
+            "quote": {"css": [".quote > .text::text", ".quote .text::text"]},
+            "author": [
+                {"css": ".author::text"},
+                {"xpath": "//small[@class='author']/text()", "name": "xpath"},
+            ],
+        }
+    """
+
+    fields = {}
+    for index, klass in enumerate(reversed(loader_cls.__mro__)):
+        for attr, value in vars(klass).items():
+            if not isinstance(value, Rules):
+                continue
+
+            # The fields named like the attributes of the loader itself, like
+            # 'item' or 'context', would break it when declared this way.
+            bases = loader_cls.__mro__[len(loader_cls.__mro__) - index :]
+            if any(
+                not isinstance(vars(base).get(attr, value), Rules) for base in bases
+            ):
+                raise ValueError(
+                    f"The '{attr}' field of {loader_cls.__name__} shadows an "
+                    f"attribute of the loader, declare it in 'extraction_plan' "
+                    f"instead."
+                )
+            fields[attr] = [value]
+
+    spec = getattr(loader_cls, "extraction_plan", None)
+    if isinstance(spec, str):
+        spec = json.loads(spec)
+    if spec is None:
+        return fields
+    if not isinstance(spec, dict):
+        raise ValueError(f"The 'extraction_plan' must be a dict, not {spec!r}.")
+
+    for field_name, field_spec in spec.items():
+        if not isinstance(field_spec, list):
+            field_spec = [field_spec]
+        fields[field_name] = [Rules.from_spec(rules) for rules in field_spec]
+    return fields
+
+
+def compile_plan(loader_cls, precompute_labels=True):
+    """Validates the rules declared on the loader class and returns its plan,
+    which is a tuple of (field_name, rule_type, rules, kwargs) steps in the
+    order that they're added by `ItemLoader.load()`.
+
+    Every rule is compiled beforehand for both html and xml documents, and is
+    pinned into the `selector_cache` of the loader so the compiled rules of the
+    plan are never evicted by the other ones. The stat labels of every rule are
+    interned into the loader's table along with the position they'll be logged
+    at, unless 'precompute_labels' is False. Any invalid rule raises a
+    `ValueError` as soon as the class is created.
+    """
+
+    item_fields = getattr(loader_cls.default_item_class, "fields", None)
+
+    steps = []
+    positions = defaultdict(int)
+    for field_name, rules_list in get_declared_fields(loader_cls).items():
+        if item_fields is not None and field_name not in item_fields:
+            raise ValueError(
+                f"{loader_cls.__name__} declares rules for the '{field_name}' "
+                f"field which isn't in {loader_cls.default_item_class.__name__}."
+            )
+
+        for rules in rules_list:
+            kw = rules.get_kwargs()
+            for rule_type in RULE_TYPES:
+                selector_rules = getattr(rules, rule_type)
+                if selector_rules is None:
+                    continue
+
+                for rule in selector_rules:
+                    precompile(loader_cls, field_name, rule_type, rule)
+
+                start = positions[field_name, rule_type] + 1
+                positions[field_name, rule_type] += len(selector_rules)
+                if precompute_labels:
+                    for position in range(start, start + len(selector_rules)):
+                        for status in STATUSES:
+                            loader_cls.build_stat_label(
+                                field_name, rule_type, position, kw.get("name"), status
+                            )
+
+                steps.append((field_name, rule_type, selector_rules, kw))
+    return tuple(steps)
+
+
+def precompile(loader_cls, field_name, rule_type, rule):
+    """Compiles the rule for every type of document that the loader could be
+    used on, since it's only known once it gets a response.
+
+    Without any `selector_cache`, the rule is only validated.
+    """
+
+    try:
+        for selector_type in TRANSLATORS:
+            if loader_cls.selector_cache is not None:
+                loader_cls.selector_cache.pin(rule_type, selector_type, rule)
+            else:
+                compile_rule(rule_type, selector_type, rule)
+    except (ValueError, SelectorError) as exc:
+        raise ValueError(
+            f"Invalid {rule_type} rule {rule!r} for the '{field_name}' field of "
+            f"{loader_cls.__name__}: {exc}"
+        ) from exc
@@ -0,0 +1,140 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from scrapy import signals
+from twisted.internet.defer import Deferred, DeferredSemaphore
+from twisted.python.failure import Failure
+
+from .stats import StatsBuffer
+
+
+def run_loader(loader_cls, populate, response_cls, url, body, encoding, kwargs):
+    """Loads a single item in a worker process, returning the item along with
+    the stats counted by its loader.
+
+    The response is rebuilt from its body so that only bytes are sent to the
+    worker, while the loader class and the 'populate' function are pickled by
+    reference.
+    """
+
+    response = response_cls(url, body=body, encoding=encoding)
+    stats = StatsBuffer(None)
+    loader = loader_cls(response=response, stats=stats, **kwargs)
+    populate(loader)
+    item = loader.load_item()
+    return item, dict(stats.counts)
+
+
+class ProcessExtractor:
+    """Runs the loaders in a `ProcessPoolExecutor` so that parsing large pages
+    doesn't block the reactor, nor is capped at a single CPU core:
+
+        def populate_quote(loader):
+            loader.add_css("quote", [".quote > .text::text", ".quote .text::text"])
+            loader.add_css("author", ".author::text")
+
+        class QuotesSpider(scrapy.Spider):
+
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.extractor = None
+
+            @classmethod
+            def from_crawler(cls, crawler, *args, **kwargs):
+                spider = super().from_crawler(crawler, *args, **kwargs)
+                spider.extractor = ProcessExtractor.from_crawler(crawler)
+                return spider
+
+            async def parse(self, response):
+                yield await self.extractor.extract(
+                    response, QuotesItemLoader, populate_quote
+                )
+
+    Both the loader class and the 'populate' function must be importable at the
+    module level of the worker processes. The stats counted in the workers are
+    added into the stats of the main process when the item is returned, so
+    they're the same as when loading the items in process.
+
+    At most 'max_pending' pages are sent to the pool at any time. The other
+    calls of `extract()` wait for their turn without holding the reactor, which
+    keeps the memory of the queued bodies bounded.
+    """
+
+    def __init__(self, stats=None, max_workers=None, max_pending=None, executor=None):
+        self.stats = stats
+        self.executor = executor or ProcessPoolExecutor(max_workers)
+        if max_pending is None:
+            max_pending = 2 * (max_workers or os.cpu_count() or 1)
+        self.semaphore = DeferredSemaphore(max_pending)
+
+        from twisted.internet import reactor
+
+        self.call_from_thread = reactor.callFromThread
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Creates the extractor configured by the following settings:
+
+        - UPKEEP_POOL_WORKERS (the number of CPUs by default)
+        - UPKEEP_POOL_MAX_PENDING (twice the number of workers by default)
+
+        The pool is shut down when the spider is closed.
+        """
+
+        settings = crawler.settings
+        extractor = cls(
+            crawler.stats,
+            max_workers=settings.getint("UPKEEP_POOL_WORKERS") or None,
+            max_pending=settings.getint("UPKEEP_POOL_MAX_PENDING") or None,
+        )
+        crawler.signals.connect(extractor.spider_closed, signal=signals.spider_closed)
+        return extractor
+
+    def extract(self, response, loader_cls, populate, **kwargs):
+        """Returns a Deferred which fires with the item loaded by 'loader_cls'
+        from the response, after 'populate(loader)' has added its rules.
+        """
+
+        return self.semaphore.run(
+            self.submit,
+            loader_cls,
+            populate,
+            response.__class__,
+            response.url,
+            response.body,
+            getattr(response, "encoding", None),
+            kwargs,
+        )
+
+    def submit(self, *args):
+        deferred = Deferred()
+
+        def done(future):
+            # This is called in a thread of the executor.
+            try:
+                result = future.result()
+            except Exception:
+                self.call_from_thread(deferred.errback, Failure())
+            else:
+                self.call_from_thread(deferred.callback, result)
+
+        self.executor.submit(run_loader, *args).add_done_callback(done)
+        deferred.addCallback(self.merge_stats)
+        return deferred
+
+    def merge_stats(self, result):
+        item, counts = result
+        if self.stats is not None and counts:
+            inc_values = getattr(self.stats, "inc_values", None)
+            if inc_values is not None:
+                inc_values(counts)
+            else:
+                for key, count in counts.items():
+                    self.stats.inc_value(key, count)
+        return item
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def spider_closed(self, spider):
+        self.close()
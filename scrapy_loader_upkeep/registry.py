@@ -0,0 +1,102 @@
+from array import array
+
+
+class RuleRegistry:
+    """Keeps the usage counts of every parser rule in a compact matrix.
+
+    Each rule, identified by its (loader_name, field_name, selector_type,
+    position, name), is assigned an integer ID which is used as the index of
+    the preallocated 'hits', 'misses' and 'skips' arrays. This takes a lot less
+    memory than having a stat key for each of them.
+    """
+
+    def __init__(self, capacity=1024):
+        self.ids = {}
+        self.rules = []
+        self.hits = zeros(capacity)
+        self.misses = zeros(capacity)
+        self.skips = zeros(capacity)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def get_id(self, loader_name, field_name, selector_type, position, name=None):
+        key = (loader_name, field_name, selector_type, position, name)
+        try:
+            return self.ids[key]
+        except KeyError:
+            pass
+
+        rule_id = self.ids[key] = len(self.rules)
+        self.rules.append(key)
+
+        # The arrays are doubled in size whenever they're full.
+        capacity = len(self.hits)
+        if rule_id >= capacity:
+            for counts in (self.hits, self.misses, self.skips):
+                counts.extend(zeros(capacity))
+        return rule_id
+
+    def record(self, rule_id, parsed_data, skipped=False):
+        if skipped:
+            self.skips[rule_id] += 1
+        elif parsed_data in (None, []):
+            self.misses[rule_id] += 1
+        else:
+            self.hits[rule_id] += 1
+
+    def get_label(self, rule_id):
+        """Returns the label of the rule, the same way as in the stats."""
+
+        loader_name, field_name, selector_type, position, name = self.rules[rule_id]
+        label = f"parser/{loader_name}/{field_name}/{selector_type}/{position}"
+        if name:
+            label += f"/{name}"
+        return label
+
+    def report(self, rare_ratio=0.01):
+        """Returns a list of (status, label, hits, misses, skips) of the rules
+        that are candidates for removal, ranked by how likely they are to be
+        obsolete:
+
+        - 'dead' rules have been evaluated but never produced any data, with
+          the most evaluated ones first.
+        - 'skipped' rules have never been evaluated at all since the rules
+          before them have always produced data in the 'first_match' mode.
+        - 'rare' rules produced data in less than 'rare_ratio' of the times
+          they've been evaluated, with the least used ones first.
+        """
+
+        dead, skipped, rare = [], [], []
+        for rule_id in range(len(self.rules)):
+            hits = self.hits[rule_id]
+            misses = self.misses[rule_id]
+            skips = self.skips[rule_id]
+            row = (self.get_label(rule_id), hits, misses, skips)
+
+            if not hits and misses:
+                dead.append(row)
+            elif not hits and not misses:
+                skipped.append(row)
+            elif hits / (hits + misses) < rare_ratio:
+                rare.append(row)
+
+        dead.sort(key=lambda row: -row[2])
+        skipped.sort(key=lambda row: -row[3])
+        rare.sort(key=lambda row: row[1] / (row[1] + row[2]))
+
+        return (
+            [("dead",) + row for row in dead]
+            + [("skipped",) + row for row in skipped]
+            + [("rare",) + row for row in rare]
+        )
+
+    def clear(self):
+        self.ids.clear()
+        del self.rules[:]
+        for counts in (self.hits, self.misses, self.skips):
+            counts[:] = zeros(len(counts))
+
+
+def zeros(size):
+    return array("Q", [0]) * size
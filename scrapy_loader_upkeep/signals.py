@@ -0,0 +1,10 @@
+"""The signals sent by the extensions of this package, which can be connected
+to like the built-in ones of Scrapy:
+
+    crawler.signals.connect(handler, signal=upkeep_signals.rule_hit_rate_dropped)
+"""
+
+# Sent by the `RuleHitRateMonitor` extension when the hit rate of a parser rule
+# has fallen below the threshold, with the 'parser_label', 'hit_rate' and
+# 'evaluations' arguments.
+rule_hit_rate_dropped = object()
@@ -0,0 +1,176 @@
+"""Snapshots of the parser rules usage that can be merged across crawls.
+
+A snapshot is a JSON lines file, optionally gzipped when its name ends with
+'.gz'. The first line is a header identifying the format and its version, and
+each of the following lines holds the counts of a single rule:
+
+    {"format": "scrapy-loader-upkeep/rule-usage", "version": 1, ...}
+    ["parser/QuotesItemLoader/quote/css/1", 0, 10, 0]
+    ["parser/QuotesItemLoader/quote/css/2", 10, 0, 0]
+
+where the counts are the hits, misses and skips of the rule. The snapshots of
+many crawls can be merged with:
+
+    $ python -m scrapy_loader_upkeep.snapshots snapshots/ --output merged.jsonl.gz
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+
+FORMAT = "scrapy-loader-upkeep/rule-usage"
+VERSION = 1
+
+
+class SnapshotError(ValueError):
+    """Raised when reading a file that isn't a supported snapshot."""
+
+
+def open_snapshot(path, mode="rt", compressed=None):
+    if compressed is None:
+        compressed = path.endswith(".gz")
+    if compressed:
+        return gzip.open(path, mode, encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
+
+
+def write_snapshot(path, rules, **metadata):
+    """Writes the (label, hits, misses, skips) of the given rules into 'path',
+    along with any additional metadata in the header.
+
+    The file is written under a temporary name first so that a partially
+    written snapshot is never picked up by the merge.
+    """
+
+    tmp_path = f"{path}.tmp"
+    with open_snapshot(tmp_path, "wt", compressed=path.endswith(".gz")) as f:
+        header = dict(metadata, format=FORMAT, version=VERSION)
+        f.write(json.dumps(header) + "\n")
+        for rule in rules:
+            f.write(json.dumps(list(rule)) + "\n")
+    os.replace(tmp_path, path)
+
+
+def registry_rules(registry):
+    """Yields the (label, hits, misses, skips) of every rule in a `RuleRegistry`."""
+
+    for rule_id in range(len(registry)):
+        yield (
+            registry.get_label(rule_id),
+            registry.hits[rule_id],
+            registry.misses[rule_id],
+            registry.skips[rule_id],
+        )
+
+
+def read_snapshot(path):
+    """Yields the (label, hits, misses, skips) of the rules in the snapshot one
+    line at a time.
+    """
+
+    with open_snapshot(path) as f:
+        try:
+            header = json.loads(f.readline())
+        except ValueError:
+            header = None
+
+        if not isinstance(header, dict) or header.get("format") != FORMAT:
+            raise SnapshotError(f"{path} is not a rule usage snapshot.")
+        if header.get("version") != VERSION:
+            raise SnapshotError(
+                f"{path} has an unsupported version: {header.get('version')}"
+            )
+
+        for line in f:
+            label, hits, misses, skips = json.loads(line)
+            yield label, hits, misses, skips
+
+
+def merge_snapshots(paths):
+    """Returns the sum of the counts of every rule, as {label: [hits, misses,
+    skips]}, in all of the given snapshots.
+
+    They are streamed one at a time, so only the merged counts are kept in
+    memory no matter how many snapshots there are.
+    """
+
+    merged = {}
+    for path in paths:
+        for label, hits, misses, skips in read_snapshot(path):
+            counts = merged.get(label)
+            if counts is None:
+                merged[label] = [hits, misses, skips]
+            else:
+                counts[0] += hits
+                counts[1] += misses
+                counts[2] += skips
+    return merged
+
+
+def find_snapshots(paths):
+    """Expands the directories in 'paths' into the snapshots inside them."""
+
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+            continue
+
+        for entry in sorted(os.scandir(path), key=lambda entry: entry.name):
+            if entry.is_file() and entry.name.endswith((".jsonl", ".jsonl.gz")):
+                yield entry.path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Merges rule usage snapshots and prints the usage of each rule."
+    )
+    parser.add_argument("paths", nargs="+", help="snapshot files or directories")
+    parser.add_argument("--output", help="writes the merged snapshot into this path")
+    parser.add_argument(
+        "--sort",
+        choices=["label", "ratio"],
+        default="label",
+        help="sorts the rules by their label or by their hit ratio",
+    )
+    args = parser.parse_args(argv)
+
+    paths = list(find_snapshots(args.paths))
+    try:
+        merged = merge_snapshots(paths)
+    except SnapshotError as exc:
+        parser.exit(1, f"{exc}\n")
+
+    if args.output:
+        write_snapshot(
+            args.output,
+            ((label, *counts) for label, counts in sorted(merged.items())),
+            merged_snapshots=len(paths),
+        )
+
+    def hit_ratio(counts):
+        hits, misses, _ = counts
+        return hits / (hits + misses) if hits + misses else None
+
+    rows = sorted(merged.items())
+    if args.sort == "ratio":
+        # The rules that have never been evaluated come first, then the least
+        # used ones.
+        rows.sort(
+            key=lambda row: (hit_ratio(row[1]) is not None, hit_ratio(row[1]) or 0)
+        )
+
+    out = sys.stdout
+    out.write(f"Merged {len(paths)} snapshots with {len(merged)} rules.\n")
+    for label, counts in rows:
+        ratio = hit_ratio(counts)
+        ratio = "n/a" if ratio is None else f"{ratio:.2%}"
+        out.write(
+            f"{label}  hits={counts[0]} missing={counts[1]} skipped={counts[2]} "
+            f"ratio={ratio}\n"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import threading
+import time
+from collections import defaultdict
+
+from scrapy import signals
+from twisted.internet import task
+
+
+class StatsBuffer:
+    """Accumulates the stats of many ItemLoaders locally and pushes them into
+    the actual stats collector in bulk.
+
+    It's meant to be shared by all of the loaders of a spider and be used in
+    place of the stats collector:
+
+        def parse(self, response):
+            loader = SiteItemLoader(response=response, stats=self.stats_buffer)
+
+    The buffered stats are pushed every 'flush_items' loaded items, every
+    'flush_interval' seconds, and when the spider is closed. The totals would
+    be the same as when using the stats collector directly.
+
+    The items are only counted for the loaders using 'buffered_stats', since
+    they push the stats of each item in a single `inc_values()` call. The
+    other loaders push every stat with `inc_value()`, which only checks the
+    'flush_interval'.
+    """
+
+    def __init__(self, stats, flush_items=None, flush_interval=None):
+        self.stats = stats
+        self.flush_items = flush_items
+        self.flush_interval = flush_interval
+        self.counts = defaultdict(int)
+        self.items = 0
+        self.last_flush = time.monotonic()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Creates the buffer configured by the following settings:
+
+        - UPKEEP_STATS_FLUSH_ITEMS
+        - UPKEEP_STATS_FLUSH_INTERVAL (in seconds)
+        """
+
+        settings = crawler.settings
+        stats_buffer = cls(
+            crawler.stats,
+            flush_items=settings.getint("UPKEEP_STATS_FLUSH_ITEMS") or None,
+            flush_interval=settings.getfloat("UPKEEP_STATS_FLUSH_INTERVAL") or None,
+        )
+        crawler.signals.connect(
+            stats_buffer.spider_closed, signal=signals.spider_closed
+        )
+        return stats_buffer
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        self.counts[key] += count
+        if self.flush_interval and self.is_interval_elapsed():
+            self.flush()
+
+    def inc_values(self, counts):
+        """Adds the stats of a single loaded item in one go."""
+
+        for key, count in counts.items():
+            self.counts[key] += count
+
+        self.items += 1
+        if self.flush_items and self.items >= self.flush_items:
+            self.flush()
+        elif self.flush_interval and self.is_interval_elapsed():
+            self.flush()
+
+    def is_interval_elapsed(self):
+        return time.monotonic() - self.last_flush >= self.flush_interval
+
+    def flush(self):
+        """Pushes all of the buffered stats into the stats collector."""
+
+        for key, count in self.counts.items():
+            self.stats.inc_value(key, count)
+
+        self.counts.clear()
+        self.items = 0
+        self.last_flush = time.monotonic()
+
+    def spider_closed(self, spider):
+        self.flush()
+
+
+class StatsShard:
+    """The stats counted by a single thread of a `ShardedStats`, along with
+    the counts that have been pushed into the stats collector already.
+    """
+
+    __slots__ = ("counts", "flushed")
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.flushed = {}
+
+
+class ShardedStats:
+    """Counts the stats of ItemLoaders running in many threads, like when
+    parsing the responses in a thread pool, and pushes them into the actual
+    stats collector on `flush()`.
+
+    It's meant to be used in place of the stats collector, just like the
+    `StatsBuffer`. Each thread increments the counters of its own `StatsShard`
+    so that no lock is needed when loading the items. The shards are never
+    cleared: `flush()` pushes the difference between a copy of each shard and
+    what has been pushed from it before, so that no increment is lost while
+    the other threads keep on counting.
+
+    The stats collector is only updated by `flush()`, which should be called
+    from the thread of the reactor since Scrapy's stats collectors aren't
+    thread-safe. When created by `from_crawler()`, it's called every
+    'flush_interval' seconds and when the spider is closed.
+    """
+
+    def __init__(self, stats, flush_interval=None):
+        self.stats = stats
+        self.flush_interval = flush_interval
+        self.local = threading.local()
+        self.shards = []
+
+        # This is only acquired when a thread creates its shard and when
+        # flushing, never while incrementing.
+        self.lock = threading.Lock()
+        self.task = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        """Creates the sharded stats configured by the following setting:
+
+        - UPKEEP_STATS_FLUSH_INTERVAL (in seconds)
+        """
+
+        sharded_stats = cls(
+            crawler.stats,
+            flush_interval=crawler.settings.getfloat("UPKEEP_STATS_FLUSH_INTERVAL")
+            or None,
+        )
+        crawler.signals.connect(
+            sharded_stats.spider_opened, signal=signals.spider_opened
+        )
+        crawler.signals.connect(
+            sharded_stats.spider_closed, signal=signals.spider_closed
+        )
+        return sharded_stats
+
+    def get_shard(self):
+        """Returns the shard of the current thread, creating it if needed."""
+
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = StatsShard()
+            with self.lock:
+                self.shards.append(shard)
+            return shard
+
+    def inc_value(self, key, count=1, start=0, spider=None):
+        self.get_shard().counts[key] += count
+
+    def inc_values(self, counts):
+        """Adds the stats of a single loaded item in one go."""
+
+        shard_counts = self.get_shard().counts
+        for key, count in counts.items():
+            shard_counts[key] += count
+
+    def get_counts(self):
+        """Returns the totals of every shard, flushed or not."""
+
+        with self.lock:
+            shards = list(self.shards)
+
+        totals = defaultdict(int)
+        for shard in shards:
+            for key, count in dict(shard.counts).items():
+                totals[key] += count
+        return dict(totals)
+
+    def flush(self):
+        """Pushes the stats counted since the last flush into the stats
+        collector.
+        """
+
+        with self.lock:
+            for shard in self.shards:
+                # Copying the dict is a single operation, so the counters of
+                # the shard are read consistently while its thread increments
+                # them.
+                counts = dict(shard.counts)
+                flushed = shard.flushed
+                for key, count in counts.items():
+                    delta = count - flushed.get(key, 0)
+                    if delta:
+                        self.stats.inc_value(key, delta)
+                shard.flushed = counts
+
+    def spider_opened(self, spider):
+        if self.flush_interval:
+            self.task = task.LoopingCall(self.flush)
+            self.task.start(self.flush_interval, now=False)
+
+    def spider_closed(self, spider):
+        if self.task is not None and self.task.running:
+            self.task.stop()
+        self.flush()
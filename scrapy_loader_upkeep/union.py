@@ -0,0 +1,120 @@
+import threading
+
+from lxml import etree
+from parsel import SelectorList
+
+from .cache import DEFAULT_NAMESPACES, is_supported, serialize, to_xpath
+
+NAMESPACE = "https://github.com/BurnzZ/scrapy-loader-upkeep"
+
+
+class UnsupportedResult(Exception):
+    """Raised when a union query matches something other than elements."""
+
+
+class UnionRule:
+    """Compiles a list of fallback rules into a single '(r1) | (r2) | ...'
+    query which is evaluated in one call.
+
+    Each rule is wrapped with a predicate that records which of them has
+    matched each of the nodes, so the values can still be attributed to their
+    own rule for the stats. This only works for rules matching elements. When
+    any of them matches something else (e.g. text or attributes), the union is
+    flagged as unsupported and `evaluate()` returns None from then on.
+
+    The instances are shared through the selector cache, so the marks of each
+    evaluation are collected in a list local to the calling thread.
+    """
+
+    def __init__(self, rule_type, selector_type, rules):
+        self.size = len(rules)
+        self.supported = True
+        self.local = threading.local()
+
+        query = " | ".join(
+            f"({to_xpath(rule_type, selector_type, rule)})[upkeep:mark({index})]"
+            for index, rule in enumerate(rules)
+        )
+        namespaces = dict(DEFAULT_NAMESPACES, upkeep=NAMESPACE)
+        try:
+            self.xpath = etree.XPath(
+                query,
+                namespaces=namespaces,
+                extensions={(NAMESPACE, "mark"): self.mark},
+                smart_strings=False,
+            )
+        except etree.XPathError:
+            self.supported = False
+
+    def mark(self, context, index):
+        try:
+            node = context.context_node
+        except Exception:
+            raise UnsupportedResult()
+        self.local.marks.append((node, int(index)))
+        return True
+
+    def evaluate(self, root, method="html"):
+        """Returns a list holding the values produced by each of the rules or
+        None when the rules can't be evaluated as a union.
+        """
+
+        if not self.supported:
+            return None
+
+        marks = self.local.marks = []
+        try:
+            result = self.xpath(root)
+        except (etree.XPathError, UnsupportedResult):
+            result = None
+        finally:
+            # The nodes aren't kept alive once the evaluation is done.
+            self.local.marks = None
+
+        if type(result) is not list or not all(
+            isinstance(node, etree._Element) for node in result
+        ):
+            self.supported = False
+            return None
+
+        # The nodes are serialized only once even if multiple rules matched
+        # them, and each rule gets them in document order.
+        positions = {node: position for position, node in enumerate(result)}
+        serialized = [serialize(node, method) for node in result]
+        values = [[] for _ in range(self.size)]
+        for node, index in sorted(marks, key=lambda mark: positions[mark[0]]):
+            values[index].append(serialized[positions[node]])
+        return values
+
+
+def extract_union(cache, selector, rule_type, rules):
+    """Returns the values of each of the rules the same way as calling
+    `selector.css(rule).getall()` (or its xpath counterpart) for each one.
+
+    None is returned when they can't be evaluated as a single union query,
+    in which case each rule should be evaluated separately.
+    """
+
+    if isinstance(selector, SelectorList):
+        values = [[] for _ in rules]
+        for member in selector:
+            member_values = extract_union(cache, member, rule_type, rules)
+            if member_values is None:
+                return None
+            for rule_values, member_rule_values in zip(values, member_values):
+                rule_values.extend(member_rule_values)
+        return values
+
+    if not is_supported(selector):
+        return None
+
+    root = selector.root
+    if not isinstance(root, etree._Element):
+        return [[] for _ in rules]
+
+    selector_type = selector.type
+    union = cache.lookup(
+        ("union", rule_type, selector_type, tuple(rules)),
+        lambda: UnionRule(rule_type, selector_type, rules),
+    )
+    return union.evaluate(root, selector._tostring_method)
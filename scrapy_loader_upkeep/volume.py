@@ -0,0 +1,105 @@
+class RuleVolume:
+    """The amount of data extracted by a parser rule across all of its
+    evaluations, where the characters are those of its string values.
+    """
+
+    __slots__ = ("evaluations", "values", "chars", "max_chars", "over_budget")
+
+    def __init__(self):
+        self.evaluations = 0
+        self.values = 0
+        self.chars = 0
+        self.max_chars = 0
+        self.over_budget = 0
+
+
+class RuleVolumes:
+    """Keeps a `RuleVolume` for every parser rule stat label, flagging the
+    evaluations whose output exceeds a budget of characters.
+    """
+
+    def __init__(self):
+        self.volumes = {}
+
+    def observe(self, parser_label, parsed_data, max_chars=None, truncate=False):
+        """Records the output of a single evaluation of the rule, returning it
+        as is, or truncated to 'max_chars' when 'truncate' is enabled.
+        """
+
+        chars = 0
+        for value in parsed_data:
+            if isinstance(value, str):
+                chars += len(value)
+
+        try:
+            volume = self.volumes[parser_label]
+        except KeyError:
+            volume = self.volumes[parser_label] = RuleVolume()
+
+        volume.evaluations += 1
+        volume.values += len(parsed_data)
+        volume.chars += chars
+        if chars > volume.max_chars:
+            volume.max_chars = chars
+
+        if max_chars is None or chars <= max_chars:
+            return parsed_data
+
+        volume.over_budget += 1
+        if truncate:
+            return truncate_values(parsed_data, max_chars)
+        return parsed_data
+
+    def over_budget(self):
+        """Returns the (label, volume) of the rules that have exceeded the
+        budget at least once, from the one with the largest output.
+        """
+
+        return sorted(
+            (
+                (parser_label, volume)
+                for parser_label, volume in self.volumes.items()
+                if volume.over_budget
+            ),
+            key=lambda row: -row[1].max_chars,
+        )
+
+    def dump(self, stats):
+        """Sets the volume of each rule next to its parser rule stats:
+
+        'parser/SiteItemLoader/NAME/css/1/volume/values': 120,
+        'parser/SiteItemLoader/NAME/css/1/volume/chars': 5832,
+        'parser/SiteItemLoader/NAME/css/1/volume/max_chars': 97,
+        'parser/SiteItemLoader/NAME/css/1/volume/over_budget': 0,
+        """
+
+        for parser_label, volume in self.volumes.items():
+            prefix = f"{parser_label}/volume"
+            stats.set_value(f"{prefix}/values", volume.values)
+            stats.set_value(f"{prefix}/chars", volume.chars)
+            stats.set_value(f"{prefix}/max_chars", volume.max_chars)
+            stats.set_value(f"{prefix}/over_budget", volume.over_budget)
+
+    def clear(self):
+        self.volumes.clear()
+
+
+def truncate_values(values, max_chars):
+    """Returns a new list of the values that fit into 'max_chars', where the
+    string crossing the limit is cut and the ones after it are dropped.
+    """
+
+    truncated = []
+    remaining = max_chars
+    for value in values:
+        if remaining <= 0:
+            break
+        if isinstance(value, str):
+            value = value[:remaining]
+            remaining -= len(value)
+        truncated.append(value)
+    return truncated
+
+
+# This is shared by all of the ItemLoader instances by default.
+rule_volumes = RuleVolumes()
@@ -0,0 +1,119 @@
+import time
+from array import array
+
+
+class HitRateWindow:
+    """A ring buffer of the hits and evaluations of a parser rule, one slot per
+    bucket of time, which takes the same memory for the whole crawl.
+
+    Each slot remembers the bucket it's holding so that the stale ones are
+    reset lazily when the ring wraps around, instead of on a timer.
+    """
+
+    __slots__ = ("epochs", "hits", "totals", "last_epoch", "healthy")
+
+    def __init__(self, size):
+        self.epochs = array("q", [-1]) * size
+        self.hits = array("Q", [0]) * size
+        self.totals = array("Q", [0]) * size
+        self.last_epoch = None
+        self.healthy = False
+
+    def add(self, epoch, hit):
+        slot = epoch % len(self.epochs)
+        if self.epochs[slot] != epoch:
+            self.epochs[slot] = epoch
+            self.hits[slot] = 0
+            self.totals[slot] = 0
+
+        self.totals[slot] += 1
+        if hit:
+            self.hits[slot] += 1
+
+    def count(self, first_epoch, last_epoch):
+        """Returns the (hits, evaluations) in the given range of buckets."""
+
+        hits = total = 0
+        for slot, epoch in enumerate(self.epochs):
+            if first_epoch <= epoch <= last_epoch:
+                hits += self.hits[slot]
+                total += self.totals[slot]
+        return hits, total
+
+
+class RuleWindows:
+    """Keeps a `HitRateWindow` for every parser rule stat label, with buckets
+    of 'bucket_seconds' over the last 'buckets' of them, e.g. per minute over
+    the last 3 hours by default.
+
+    Whenever a rule is evaluated in a new bucket, its hit rate over the last
+    'span' complete buckets is checked. If it was at least 'threshold' before
+    but has fallen below it, every hook is called with (label, hit_rate,
+    evaluations). Only the windows having at least 'min_evaluations' are
+    checked, so a handful of unlucky pages isn't mistaken for a layout change.
+    The rules that have never been above the threshold, like rarely used
+    fallbacks, never trigger the hooks.
+    """
+
+    def __init__(
+        self,
+        bucket_seconds=60,
+        buckets=180,
+        span=10,
+        threshold=0.5,
+        min_evaluations=100,
+        clock=time.monotonic,
+    ):
+        if not 0 < span < buckets:
+            raise ValueError("The 'span' must be between 0 and 'buckets'.")
+
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.span = span
+        self.threshold = threshold
+        self.min_evaluations = min_evaluations
+        self.clock = clock
+        self.windows = {}
+        self.hooks = []
+
+    def record(self, parser_label, hit):
+        epoch = int(self.clock() // self.bucket_seconds)
+
+        try:
+            window = self.windows[parser_label]
+        except KeyError:
+            window = self.windows[parser_label] = HitRateWindow(self.buckets)
+
+        if window.last_epoch is not None and epoch != window.last_epoch:
+            self.check(parser_label, window, epoch)
+        window.last_epoch = epoch
+        window.add(epoch, hit)
+
+    def check(self, parser_label, window, epoch):
+        hits, total = window.count(epoch - self.span, epoch - 1)
+        if total < self.min_evaluations:
+            return
+
+        hit_rate = hits / total
+        if hit_rate >= self.threshold:
+            window.healthy = True
+        elif window.healthy:
+            window.healthy = False
+            for hook in self.hooks:
+                hook(parser_label, hit_rate, total)
+
+    def hit_rate(self, parser_label, span=None):
+        """Returns the hit rate of the rule over the last 'span' buckets, the
+        current one included, or None if it hasn't been evaluated in them.
+        """
+
+        window = self.windows.get(parser_label)
+        if window is None:
+            return None
+
+        epoch = int(self.clock() // self.bucket_seconds)
+        hits, total = window.count(epoch - (span or self.span) + 1, epoch)
+        return hits / total if total else None
+
+    def clear(self):
+        self.windows.clear()
@@ -27,6 +27,14 @@ setup(
     install_requires=[
         'scrapy'
     ],
+    extras_require={
+        'jmes': ['jmespath'],
+    },
+    entry_points={
+        'console_scripts': [
+            'upkeep-snapshots=scrapy_loader_upkeep.snapshots:main',
+        ],
+    },
     python_requires='>=3.6',
     classifiers={
         'Development Status :: 5 - Production/Stable',
@@ -0,0 +1,36 @@
+"""The page and the loader shared by the tests of every module."""
+
+from scrapy import Field, Item
+from scrapy.http import TextResponse
+
+from scrapy_loader_upkeep import ItemLoader
+
+TEST_HTML_BODY = """
+<html>
+    <title>This is a title</title>
+    <body>
+        <article>
+            <h2>Product #1</h2>
+            <span class='price'>$1.23</span>
+        </article>
+
+        <article>
+            <div class='product-title'>Product #2</div>
+            <span class='price'>$9.99</span>
+        </article>
+    </body>
+</html>
+"""
+RESPONSE = TextResponse("https://test.com", body=TEST_HTML_BODY, encoding="utf-8")
+
+
+class TestItem(Item):
+    __test__ = False
+
+    title = Field()
+
+
+class TestItemLoader(ItemLoader):
+    __test__ = False
+
+    default_item_class = TestItem
@@ -0,0 +1,99 @@
+from unittest import mock
+
+from scrapy_loader_upkeep.adaptive import RuleHealth, rank
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+def test_rule_health_breaker():
+    health = RuleHealth()
+    for _ in range(3):
+        assert health.allow(3, 5)
+        health.record(False)
+
+    # It's tripped, with a probe every 5 times.
+    assert [health.allow(3, 5) for _ in range(10)] == [False] * 4 + [True] + [
+        False
+    ] * 4 + [True]
+
+    health.record(True)
+    assert health.allow(3, 5)
+    assert health.consecutive_misses == 0
+
+    health.record(False)
+    assert health.allow(None, 5)
+
+
+def test_rank():
+    never, always, fresh = RuleHealth(), RuleHealth(), RuleHealth()
+    for _ in range(10):
+        never.record(False)
+        always.record(True)
+
+    assert rank([never, always, fresh]) == [1, 2, 0]
+    assert rank([RuleHealth(), RuleHealth()]) == [0, 1]
+
+
+def make_loader_cls(**attrs):
+    return type("AdaptiveItemLoader", (TestItemLoader,), dict(attrs))
+
+
+def test_adaptive_ordering():
+    loader_cls = make_loader_cls(adaptive_fallbacks=True, first_match=True)
+    rules = ["h1::text", "h2::text", "article h2::text"]
+
+    loader = loader_cls(response=RESPONSE, stats=mock.MagicMock())
+    loader.add_css("title", rules)
+    assert loader.get_output_value("title") == ["Product #1"]
+
+    # The second rule has the best hit rate from now on, while the first one
+    # has the worst since it's the only one that has missed.
+    stats = mock.MagicMock()
+    loader = loader_cls(response=RESPONSE, stats=stats)
+    loader.add_css("title", rules)
+    assert loader.get_output_value("title") == ["Product #1"]
+    assert stats.inc_value.call_args_list == [
+        mock.call("parser/AdaptiveItemLoader/title/css/2"),
+        mock.call("parser/AdaptiveItemLoader/title/css/3/skipped"),
+        mock.call("parser/AdaptiveItemLoader/title/css/1/skipped"),
+    ]
+
+    # The next call of the field still continues from the declared positions.
+    loader.add_css("title", "h2::text")
+    assert stats.inc_value.call_args_list[-1] == mock.call(
+        "parser/AdaptiveItemLoader/title/css/4"
+    )
+
+
+def test_adaptive_breaker():
+    loader_cls = make_loader_cls(
+        adaptive_fallbacks=True, breaker_threshold=2, breaker_probe_interval=3
+    )
+
+    stats = mock.MagicMock()
+    for _ in range(5):
+        loader = loader_cls(response=RESPONSE, stats=stats)
+        loader.add_css("title", ["h1::text", "h2::text"])
+        assert loader.get_output_value("title") == ["Product #1"]
+
+    labels = [call[0][0] for call in stats.inc_value.call_args_list]
+    assert labels == [
+        "parser/AdaptiveItemLoader/title/css/1/missing",
+        "parser/AdaptiveItemLoader/title/css/2",
+        "parser/AdaptiveItemLoader/title/css/1/missing",
+        "parser/AdaptiveItemLoader/title/css/2",
+        "parser/AdaptiveItemLoader/title/css/1/suppressed",
+        "parser/AdaptiveItemLoader/title/css/2",
+        "parser/AdaptiveItemLoader/title/css/1/suppressed",
+        "parser/AdaptiveItemLoader/title/css/2",
+        # This is the probe.
+        "parser/AdaptiveItemLoader/title/css/1/missing",
+        "parser/AdaptiveItemLoader/title/css/2",
+    ]
+
+
+def test_adaptive_disabled_for_get_methods():
+    loader_cls = make_loader_cls(adaptive_fallbacks=True, breaker_threshold=1)
+    loader = loader_cls(response=RESPONSE)
+    for _ in range(3):
+        assert loader.get_css(["h1::text", "h2::text"]) == ["Product #1"]
+    assert not loader_cls._rule_health
@@ -0,0 +1,174 @@
+import pytest
+from scrapy import Field, Item
+from scrapy.http import HtmlResponse
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapy_loader_upkeep import ItemLoader, Rules
+from scrapy_loader_upkeep.bulk import BulkRows, is_row_relative
+
+QUOTES_BODY = """
+<html>
+    <title>Quotes</title>
+    <body>
+        <div class="quote">
+            <span class="text">Quote #1</span>
+            <small class="author" data-id="a1">Author #1</small>tail #1
+            <a class="tag" href="/tag/1">one</a><a class="tag" href="/tag/2">two</a>
+        </div>
+        <div class="quote">
+            <span class="text">Quote #2</span>
+            <small class="author" data-id="a2">Author #2</small>tail #2
+        </div>
+        <div class="quote">
+            <span>Quote #3</span>
+        </div>
+    </body>
+</html>
+"""
+QUOTES_RESPONSE = HtmlResponse("https://test.com", body=QUOTES_BODY, encoding="utf-8")
+
+
+class QuoteItem(Item):
+    quote = Field()
+    author = Field()
+    author_id = Field()
+    tags = Field()
+    title = Field()
+    parent = Field()
+    tail = Field()
+
+
+class QuoteItemLoader(ItemLoader):
+    default_item_class = QuoteItem
+
+
+def populate(loader):
+    loader.add_css("quote", [".missing::text", "span.text::text", "span::text"])
+    loader.add_css("author", ".author::text", name="author")
+    loader.add_css("author_id", ".author::attr(data-id)")
+    loader.add_xpath("tags", ".//a[@class='tag']")
+    loader.add_xpath("title", "//title/text()")
+    loader.add_xpath("parent", "../@class")
+    loader.add_xpath("tail", "small/following-sibling::text()[1]")
+
+
+def get_stats():
+    return MemoryStatsCollector(get_crawler())
+
+
+@pytest.mark.parametrize(
+    "row_kwargs", [{"row_css": "div.quote"}, {"row_xpath": "//div"}]
+)
+def test_load_items_same_as_loop(row_kwargs):
+    loop_stats, bulk_stats = get_stats(), get_stats()
+
+    if "row_css" in row_kwargs:
+        rows = QUOTES_RESPONSE.css(row_kwargs["row_css"])
+    else:
+        rows = QUOTES_RESPONSE.xpath(row_kwargs["row_xpath"])
+
+    expected = []
+    for row in rows:
+        loader = QuoteItemLoader(selector=row, stats=loop_stats)
+        populate(loader)
+        expected.append(loader.load_item())
+
+    items = list(
+        QuoteItemLoader.load_items(
+            QUOTES_RESPONSE, populate, stats=bulk_stats, **row_kwargs
+        )
+    )
+
+    assert len(items) == 3
+    assert items == expected
+    assert bulk_stats.get_stats() == loop_stats.get_stats()
+
+
+def test_load_items_nested_rows():
+    """Nested rows are still supported by evaluating the rules on each row."""
+
+    items = list(
+        QuoteItemLoader.load_items(
+            QUOTES_RESPONSE,
+            lambda loader: loader.add_css("quote", "span::text"),
+            row_xpath="//body | //div",
+        )
+    )
+    assert [item["quote"] for item in items] == [
+        ["Quote #1", "Quote #2", "Quote #3"],
+        ["Quote #1"],
+        ["Quote #2"],
+        ["Quote #3"],
+    ]
+
+
+def test_load_items_plan():
+    """The rows are loaded from the declared fields without 'populate'."""
+
+    class PlanItemLoader(QuoteItemLoader):
+        quote = Rules(css=[".missing::text", "span.text::text"], first_match=True)
+        author = Rules(css=".author::text")
+
+    stats = get_stats()
+    items = list(
+        PlanItemLoader.load_items(QUOTES_RESPONSE, row_css="div.quote", stats=stats)
+    )
+
+    assert items == [
+        {"quote": ["Quote #1"], "author": ["Author #1"]},
+        {"quote": ["Quote #2"], "author": ["Author #2"]},
+        {},
+    ]
+    assert stats.get_value("parser/PlanItemLoader/quote/css/2") == 2
+    assert stats.get_value("parser/PlanItemLoader/author/css/1/missing") == 1
+
+
+def test_bulk_rows_evaluated_once():
+    bulk_rows = BulkRows.from_selector(QUOTES_RESPONSE.selector, row_css="div.quote")
+
+    assert bulk_rows.extract(0, "css", ".author::text") == ["Author #1"]
+    assert bulk_rows.extract(1, "css", ".author::text") == ["Author #2"]
+    assert bulk_rows.extract(2, "css", ".author::text") == []
+    assert bulk_rows.results[("css", ".author::text")] == [
+        ["Author #1"],
+        ["Author #2"],
+        [],
+    ]
+
+    # Falls back to each row since it's not relative to them.
+    assert bulk_rows.extract(0, "xpath", "//title/text()") == ["Quotes"]
+    assert bulk_rows.results[("xpath", "//title/text()")] is None
+
+
+def test_bulk_rows_needs_a_single_row_rule():
+    with pytest.raises(ValueError):
+        BulkRows.from_selector(QUOTES_RESPONSE.selector)
+
+    with pytest.raises(ValueError):
+        BulkRows.from_selector(
+            QUOTES_RESPONSE.selector, row_css="div", row_xpath="//div"
+        )
+
+
+@pytest.mark.parametrize(
+    "xpath, expected",
+    [
+        ("descendant-or-self::span/text()", True),
+        (".//a[@href='..']", True),
+        ("span[contains(@class, 'x')]", True),
+        ("@href", True),
+        ("*", True),
+        ("//span", False),
+        ("/html", False),
+        ("../span", False),
+        ("span/ancestor::div", False),
+        ("span/following-sibling::a", False),
+        ("span | a", False),
+        ("count(span)", False),
+        ("(.//span)[1]", False),
+        ("span[@id=$id]", False),
+    ],
+)
+def test_is_row_relative(xpath, expected):
+    assert is_row_relative(xpath) is expected
@@ -0,0 +1,151 @@
+import sys
+import threading
+
+import pytest
+from scrapy.http import XmlResponse
+from scrapy.selector import Selector
+
+from scrapy_loader_upkeep.cache import SelectorCache, selector_cache
+from tests.helpers import RESPONSE, TestItemLoader
+
+XML_RESPONSE = XmlResponse(
+    "https://test.com/feed.xml",
+    body=b"<feed><Entry id='1'><Title>One</Title></Entry><Entry/></feed>",
+)
+
+
+@pytest.mark.parametrize(
+    "rule_type, rule",
+    [
+        ("css", "article h2::text"),
+        ("css", "article .price"),
+        ("css", "span::attr(class)"),
+        ("css", "h1::text"),
+        ("xpath", "//article/*[1]"),
+        ("xpath", "//span/@class"),
+        ("xpath", "count(//article)"),
+        ("xpath", "boolean(//article)"),
+        ("xpath", "string(//title)"),
+    ],
+)
+def test_extract_same_as_parsel(rule_type, rule):
+    """The compiled rules must produce exactly what parsel produces."""
+
+    cache = SelectorCache()
+    selector = Selector(RESPONSE)
+    expected = getattr(selector, rule_type)(rule).getall()
+
+    assert cache.extract(selector, rule_type, rule) == expected
+
+    articles = selector.css("article")
+    expected = getattr(articles, rule_type)(rule).getall()
+    assert cache.extract(articles, rule_type, rule) == expected
+
+
+def test_extract_xml():
+    cache = SelectorCache()
+    selector = Selector(XML_RESPONSE)
+
+    for rule_type, rule in [("css", "Entry Title"), ("xpath", "//Entry/@id")]:
+        expected = getattr(selector, rule_type)(rule).getall()
+        assert cache.extract(selector, rule_type, rule) == expected
+
+
+def test_extract_custom_namespaces():
+    """Selectors with custom namespaces fallback to parsel."""
+
+    cache = SelectorCache()
+    selector = Selector(XML_RESPONSE)
+    selector.register_namespace("ns", "https://test.com/ns")
+
+    assert cache.extract(selector, "xpath", "//Title/text()") == ["One"]
+    assert len(cache) == 0
+
+
+def test_invalid_xpath():
+    with pytest.raises(ValueError):
+        SelectorCache().extract(Selector(RESPONSE), "xpath", "//[")
+
+
+def test_counters():
+    cache = SelectorCache(maxsize=2)
+
+    first = cache.get("css", "html", "h1")
+    assert cache.get("css", "html", "h1") is first
+    cache.get("xpath", "html", "//h1")
+    cache.get("css", "xml", "h1")
+
+    assert cache.info() == {
+        "hits": 1,
+        "misses": 3,
+        "evictions": 1,
+        "size": 2,
+        "maxsize": 2,
+        "pinned": 0,
+    }
+
+    # The least recently used one has been evicted.
+    cache.get("css", "html", "h1")
+    assert cache.misses == 4
+
+    cache.clear()
+    assert cache.info()["size"] == cache.info()["misses"] == 0
+
+
+def test_shared_across_loaders():
+    selector_cache.clear()
+
+    for _ in range(3):
+        loader = TestItemLoader(response=RESPONSE)
+        loader.add_css("title", "article > h2::text")
+        assert loader.get_output_value("title") == ["Product #1"]
+
+    assert selector_cache.misses == 1
+    assert selector_cache.hits == 2
+
+
+def test_cache_threads():
+    """Each thread compiles its own rules, since lxml serializes the calls of
+    the same compiled XPath.
+    """
+
+    cache = SelectorCache(maxsize=4)
+    cache.pin("css", "html", "h1")
+    rules = [f"h{level}" for level in range(1, 7)]
+    compiled = {}
+    errors = []
+
+    def work():
+        try:
+            for _ in range(500):
+                for rule in rules:
+                    cache.get("css", "html", rule)
+            compiled[threading.get_ident()] = (
+                cache.get("css", "html", "h1"),
+                cache.get("css", "html", "h6"),
+                len(cache),
+            )
+        except Exception as exc:
+            errors.append(exc)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
+    assert len(compiled) == 4
+    for index in (0, 1):
+        objects = {id(entries[index]) for entries in compiled.values()}
+        assert len(objects) == 4
+    assert {entries[2] for entries in compiled.values()} == {4}
+
+    # The pinned rule of the main thread is still its own.
+    assert cache.get("css", "html", "h1") is cache.pin("css", "html", "h1")
+    assert len(cache) == 0
@@ -0,0 +1,98 @@
+from unittest import mock
+
+from scrapy import Field, Item
+from scrapy.http import XmlResponse
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapy_loader_upkeep import ItemLoader, Rules
+from scrapy_loader_upkeep.feeds import iter_records
+
+
+def make_feed(size):
+    records = "".join(
+        f"<product><title>Product #{index}</title><price>{index}.99</price>"
+        f"</product>"
+        for index in range(size)
+    )
+    return f"<?xml version='1.0'?><feed>{records}</feed>".encode("utf-8")
+
+
+class ProductItem(Item):
+    title = Field()
+    price = Field()
+
+
+class ProductItemLoader(ItemLoader):
+    default_item_class = ProductItem
+
+
+def populate(loader):
+    loader.add_css("title", ["name::text", "title::text"])
+    loader.add_xpath("price", "./price/text()")
+
+
+def test_iter_records(tmp_path):
+    path = tmp_path / "feed.xml"
+    path.write_bytes(make_feed(100))
+
+    for source in (str(path), path.open("rb"), make_feed(100)):
+        count = 0
+        for element in iter_records(source, "product"):
+            assert element.findtext("title") == f"Product #{count}"
+
+            # The elements before the current one have been released.
+            assert element.getprevious() is None
+            count += 1
+        assert count == 100
+
+
+def test_load_feed():
+    stats = MemoryStatsCollector(get_crawler())
+    response = XmlResponse("https://test.com/feed.xml", body=make_feed(3))
+
+    items = list(
+        ProductItemLoader.load_feed(response, "product", populate, stats=stats)
+    )
+    assert items == [
+        {"title": [f"Product #{index}"], "price": [f"{index}.99"]} for index in range(3)
+    ]
+    assert stats.get_stats() == {
+        "parser/ProductItemLoader/title/css/1/missing": 3,
+        "parser/ProductItemLoader/title/css/2": 3,
+        "parser/ProductItemLoader/price/xpath/1": 3,
+    }
+
+
+def test_load_feed_plan():
+    class PlanItemLoader(ProductItemLoader):
+        title = Rules(css="title::text")
+
+    stats = mock.MagicMock()
+    items = list(PlanItemLoader.load_feed(make_feed(2), "product", stats=stats))
+    assert items == [{"title": ["Product #0"]}, {"title": ["Product #1"]}]
+    assert stats.inc_value.call_count == 2
+
+
+def test_load_feed_namespaces():
+    body = (
+        b"<urlset xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'>"
+        b"<url><loc>https://test.com/1</loc></url>"
+        b"<url><loc>https://test.com/2</loc></url>"
+        b"</urlset>"
+    )
+    namespaces = {"s": "http://www.sitemaps.org/schemas/sitemap/0.9"}
+
+    class SitemapItemLoader(ItemLoader):
+        default_item_class = dict
+
+    items = SitemapItemLoader.load_feed(
+        body,
+        "{http://www.sitemaps.org/schemas/sitemap/0.9}url",
+        lambda loader: loader.add_xpath("loc", "./s:loc/text()"),
+        namespaces=namespaces,
+    )
+    assert [item["loc"] for item in items] == [
+        ["https://test.com/1"],
+        ["https://test.com/2"],
+    ]
@@ -0,0 +1,155 @@
+import json
+import sys
+import threading
+from unittest import mock
+
+import pytest
+from scrapy.http import TextResponse
+
+from scrapy_loader_upkeep.jmes import JsonDocument, JsonDocuments
+from scrapy_loader_upkeep.cache import SelectorCache
+from tests.helpers import TestItemLoader
+
+DATA = {"product": {"name": "Product #1", "tags": ["a", "b"]}, "price": 1.23}
+
+JSON_RESPONSE = TextResponse(
+    "https://test.com/api", body=json.dumps(DATA), encoding="utf-8"
+)
+
+HTML_RESPONSE = TextResponse(
+    "https://test.com",
+    body=f"""
+    <html><body>
+        <script id="data" type="application/json">{json.dumps(DATA)}</script>
+    </body></html>
+    """,
+    encoding="utf-8",
+)
+
+
+def test_json_document():
+    cache = SelectorCache()
+    document = JsonDocument(DATA, cache=cache)
+
+    assert document.jmes("product.name") == ["Product #1"]
+    assert document.jmes("product.tags") == ["a", "b"]
+    assert document.jmes("product.missing") == []
+    assert document.jmes("product.name") == ["Product #1"]
+
+    # The compiled expressions are shared through the cache.
+    assert cache.info()["misses"] == 3
+    assert cache.info()["hits"] == 1
+
+    assert JsonDocument(None).jmes("product.name") == []
+
+
+def test_add_jmes():
+    stats = mock.MagicMock()
+    loader = TestItemLoader(response=JSON_RESPONSE, stats=stats)
+    loader.json_documents = JsonDocuments()
+
+    loader.add_jmes("title", ["title", "product.name"])
+    loader.add_jmes("title", "product.tags", name="tags")
+    assert loader.get_jmes("price") == [1.23]
+
+    assert loader.get_output_value("title") == ["Product #1", "a", "b"]
+    assert stats.inc_value.call_args_list == [
+        mock.call("parser/TestItemLoader/title/jmes/1/missing"),
+        mock.call("parser/TestItemLoader/title/jmes/2"),
+        mock.call("parser/TestItemLoader/title/jmes/3/tags"),
+    ]
+
+    loader.replace_jmes("title", "product.name")
+    assert loader.get_output_value("title") == ["Product #1"]
+
+    # The JSON is only decoded once for the response.
+    assert loader.json_documents.misses == 1
+    assert loader.json_documents.hits == 3
+
+
+def test_add_jmes_source():
+    class JmesItemLoader(TestItemLoader):
+        json_documents = JsonDocuments()
+
+    documents = JmesItemLoader.json_documents
+    for _ in range(2):
+        loader = JmesItemLoader(response=HTML_RESPONSE, stats=mock.MagicMock())
+        loader.add_jmes("title", "product.name", source="script#data::text")
+        assert loader.get_output_value("title") == ["Product #1"]
+
+        # The nested loaders share the same document.
+        nested = loader.nested_css("body")
+        nested.add_jmes("title", "product.name", source="script#data::text")
+
+    assert (documents.misses, documents.hits) == (1, 3)
+
+    loader.add_jmes("title", "product.name", source="script#missing::text")
+    loader.stats.inc_value.assert_called_with(
+        "parser/JmesItemLoader/title/jmes/3/missing"
+    )
+
+
+def test_add_jmes_objects():
+    """The JSON objects are loaded as values instead of being flattened."""
+
+    data = {
+        "product": {"a": 1},
+        "offers": [{"price": 1, "cur": "USD"}],
+        "sizes": [["S", "M"], ["L"]],
+    }
+    response = TextResponse(
+        "https://test.com/api", body=json.dumps(data), encoding="utf-8"
+    )
+    loader = TestItemLoader(response=response)
+    loader.json_documents = JsonDocuments()
+
+    assert loader.get_jmes("product") == [{"a": 1}]
+    assert loader.get_jmes("offers") == [{"price": 1, "cur": "USD"}]
+    assert loader.get_jmes("sizes") == ["S", "M", "L"]
+
+    loader.add_jmes("title", ["missing", "product", "offers"])
+    assert loader.get_output_value("title") == [
+        {"a": 1},
+        {"price": 1, "cur": "USD"},
+    ]
+
+
+def test_jmes_without_response():
+    loader = TestItemLoader(selector=HTML_RESPONSE.selector)
+    assert loader.get_jmes("price", source="script::text") == [1.23]
+
+    with pytest.raises(ValueError, match="'source' css rule is required"):
+        loader.get_jmes("price")
+
+
+def test_json_documents_threads():
+    """The threads loading the same response share a single document."""
+
+    documents = JsonDocuments()
+    responses = [
+        TextResponse(
+            f"https://test.com/{index}", body=json.dumps(DATA), encoding="utf-8"
+        )
+        for index in range(50)
+    ]
+    found = []
+
+    def work():
+        for response in responses:
+            found.append(
+                documents.get(response, None, lambda: JsonDocument(response.text))
+            )
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert len({id(document) for document in found}) == len(responses)
+    assert documents.misses == len(responses)
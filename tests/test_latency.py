@@ -0,0 +1,134 @@
+from unittest import mock
+
+import pytest
+from scrapy import signals
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+
+from scrapy_loader_upkeep import ItemLoader
+from scrapy_loader_upkeep.extensions import RuleLatencyStats
+from scrapy_loader_upkeep.latency import LatencyHistogram, RuleLatencies, rule_latencies
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+def test_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(50) == 0.0
+
+    for micros in [3, 3, 3, 3, 3, 3, 3, 3, 3, 100]:
+        histogram.observe(micros / 1e6)
+
+    assert histogram.count == 10
+    assert histogram.total == pytest.approx(127)
+    assert histogram.max == pytest.approx(100)
+    assert histogram.percentile(50) == 4
+    assert histogram.percentile(95) == pytest.approx(100)
+
+    # Beyond the last bucket.
+    histogram.observe(60)
+    assert histogram.counts[-1] == 1
+    assert histogram.percentile(100) == pytest.approx(60e6)
+
+
+def test_loader_track_latency():
+    class LatencyItemLoader(TestItemLoader):
+        track_latency = True
+        rule_latencies = RuleLatencies()
+
+    loader = LatencyItemLoader(response=RESPONSE)
+    loader.add_css("title", ["h1::text", "article h2::text"], name="title")
+    loader.add_css("title", "h2::text", first_match=True)
+    loader.get_css("h2::text")
+
+    assert sorted(LatencyItemLoader.rule_latencies.histograms) == [
+        "parser/LatencyItemLoader/title/css/1/title",
+        "parser/LatencyItemLoader/title/css/2/title",
+        "parser/LatencyItemLoader/title/css/3",
+    ]
+
+    stats = mock.Mock()
+    LatencyItemLoader.rule_latencies.dump(stats)
+    stats.set_value.assert_any_call(
+        "parser/LatencyItemLoader/title/css/3/latency/total_us", mock.ANY
+    )
+    assert stats.set_value.call_count == 12
+
+
+def test_extension():
+    crawler = mock.Mock(settings=Settings())
+    with pytest.raises(NotConfigured):
+        RuleLatencyStats.from_crawler(crawler)
+
+    crawler = mock.Mock(settings=Settings({"UPKEEP_LATENCY_ENABLED": True}))
+    extension = RuleLatencyStats.from_crawler(crawler)
+    crawler.signals.connect.assert_any_call(
+        extension.spider_closed, signal=signals.spider_closed
+    )
+
+    # The loaders are only instrumented while the spider is running.
+    assert ItemLoader.track_latency is False
+    extension.spider_opened(None)
+    try:
+        assert ItemLoader.track_latency is True
+        assert ItemLoader.rule_latencies is extension.latencies
+
+        loader = TestItemLoader(response=RESPONSE)
+        loader.add_css("title", "article h2::text")
+    finally:
+        extension.spider_closed(None)
+
+    assert ItemLoader.track_latency is False
+    assert ItemLoader.rule_latencies is rule_latencies
+    keys = [call.args[0] for call in crawler.stats.set_value.call_args_list]
+    assert "parser/TestItemLoader/title/css/1/latency/max_us" in keys
+
+
+def test_extension_per_crawler():
+    """The crawlers don't share their latencies, nor wipe each other's."""
+
+    settings = Settings({"UPKEEP_LATENCY_ENABLED": True})
+    first = RuleLatencyStats.from_crawler(mock.Mock(settings=settings))
+    second = RuleLatencyStats.from_crawler(mock.Mock(settings=settings))
+    assert first.latencies is not second.latencies
+
+    first.spider_opened(None)
+    try:
+        TestItemLoader(response=RESPONSE).add_css("title", "article h2::text")
+    finally:
+        first.spider_closed(None)
+
+    second.spider_opened(None)
+    second.spider_closed(None)
+    assert len(first.latencies.histograms) == 1
+    assert second.latencies.histograms == {}
+
+
+def test_extension_overlapping_crawlers():
+    """The defaults follow the running spiders when they're opened and closed
+    in any order.
+    """
+
+    settings = Settings({"UPKEEP_LATENCY_ENABLED": True})
+    first = RuleLatencyStats.from_crawler(mock.Mock(settings=settings))
+    second = RuleLatencyStats.from_crawler(mock.Mock(settings=settings))
+    third = RuleLatencyStats.from_crawler(mock.Mock(settings=settings))
+
+    first.spider_opened(None)
+    second.spider_opened(None)
+    try:
+        assert ItemLoader.rule_latencies is second.latencies
+
+        first.spider_closed(None)
+        assert ItemLoader.track_latency is True
+        assert ItemLoader.rule_latencies is second.latencies
+
+        third.spider_opened(None)
+        assert ItemLoader.rule_latencies is third.latencies
+        third.spider_closed(None)
+        assert ItemLoader.rule_latencies is second.latencies
+    finally:
+        for extension in (first, second, third):
+            extension.spider_closed(None)
+
+    assert ItemLoader.track_latency is False
+    assert ItemLoader.rule_latencies is rule_latencies
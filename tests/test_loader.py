@@ -3,8 +3,8 @@ from unittest import mock
 
 from scrapy_loader_upkeep import ItemLoader
 from scrapy.utils.python import flatten
-from scrapy.http import TextResponse
-from scrapy import Item, Field
+
+from tests.helpers import RESPONSE, TestItem, TestItemLoader
 
 
 def test_get_selector_values_with_no_selector():
@@ -31,7 +31,7 @@ def test_get_selector_values():
     loader.write_to_stats = mock.Mock()
 
     # This wasn't actually initialized so it will return 0 by default otherwise.
-    loader.field_tracker["field_css"] = 1
+    loader.field_tracker[loader.get_tracker_key("field", "css")] = 1
 
     result = loader.get_selector_values(field_name, selector_rules, mock_selector)
 
@@ -57,6 +57,31 @@ def test_get_selector_values():
     )
 
 
+def test_get_selector_values_flattening():
+    """The values of every rule are added to a single new list, while the ones
+    that aren't from css or xpath rules are still flattened.
+    """
+
+    parsed_data = ["data1", "data2"]
+    mock_selector = mock.Mock()
+    mock_selector().getall.return_value = parsed_data
+    mock_selector.__name__ = "css"
+
+    loader = ItemLoader(selector=mock_selector)
+    result = loader.get_selector_values("field", ["#rule1", "#rule2"], mock_selector)
+    assert result == ["data1", "data2", "data1", "data2"]
+    assert parsed_data == ["data1", "data2"]
+
+    nested_selector = mock.Mock()
+    nested_selector().getall.side_effect = [[["a", ["b"]], "c"], [], [("d",)]]
+    nested_selector.__name__ = "jmes"
+
+    result = loader.get_selector_values(
+        "field", ["rule1", "rule2", "rule3"], nested_selector
+    )
+    assert result == ["a", "b", "c", "d"]
+
+
 def test_write_to_stats_with_uninjected_stat_dependency():
     """It should not call stats when the stat dependency isn't available."""
 
@@ -115,33 +140,6 @@ def test_write_to_stats():
     )
 
 
-TEST_HTML_BODY = """
-<html>
-    <title>This is a title</title>
-    <body>
-        <article>
-            <h2>Product #1</h2>
-            <span class='price'>$1.23</span>
-        </article>
-
-        <article>
-            <div class='product-title'>Product #2</div>
-            <span class='price'>$9.99</span>
-        </article>
-    </body>
-</html>
-"""
-RESPONSE = TextResponse("https://test.com", body=TEST_HTML_BODY, encoding="utf-8")
-
-
-class TestItem(Item):
-    title = Field()
-
-
-class TestItemLoader(ItemLoader):
-    default_item_class = TestItem
-
-
 @pytest.fixture()
 def loader():
     mock_stats = mock.MagicMock()
@@ -229,3 +227,227 @@ def test_multiple_2_with_name(loader):
         ]
     )
     assert loader.stats.inc_value.call_count == 4
+
+
+def test_stat_labels_are_interned():
+    """The same label object should be reused across loader instances."""
+
+    class LabelItemLoader(ItemLoader):
+        pass
+
+    first, second = LabelItemLoader(), LabelItemLoader()
+    first.stats, second.stats = mock.Mock(), mock.Mock()
+
+    first.write_to_stats("field_name", None, 1, "css", name="name")
+    second.write_to_stats("field_name", None, 1, "css", name="name")
+
+    first_label = first.stats.inc_value.call_args[0][0]
+    assert first_label == "parser/LabelItemLoader/field_name/css/1/name/missing"
+    assert first_label is second.stats.inc_value.call_args[0][0]
+
+    # The tables are kept per loader class.
+    assert LabelItemLoader._stat_labels is not ItemLoader._stat_labels
+    assert len(LabelItemLoader._stat_labels) == 1
+
+
+def test_stat_labels_loader_name_per_instance():
+    class SiteItemLoader(ItemLoader):
+        @property
+        def loader_name(self):
+            return self.context["site"]
+
+    labels = []
+    for site in ("A", "B", "A"):
+        loader = SiteItemLoader(site=site)
+        loader.stats = mock.Mock()
+        loader.write_to_stats("field_name", "parsed_data", 1, "css")
+        labels.append(loader.stats.inc_value.call_args[0][0])
+
+    assert labels == [
+        "parser/A/field_name/css/1",
+        "parser/B/field_name/css/1",
+        "parser/A/field_name/css/1",
+    ]
+    assert labels[0] is labels[2]
+
+
+def test_get_tracker_key():
+    class TrackerItemLoader(ItemLoader):
+        pass
+
+    assert TrackerItemLoader.get_tracker_key("field", "css") == 0
+    assert TrackerItemLoader.get_tracker_key("field", "xpath") == 1
+    assert TrackerItemLoader.get_tracker_key("other", "css") == 2
+    assert TrackerItemLoader.get_tracker_key("field", "css") == 0
+
+
+def test_write_to_stats_skipped():
+    """Skipped rules should be logged separately from the missing ones."""
+
+    loader = ItemLoader()
+    loader.stats = mock.Mock()
+
+    loader.write_to_stats("field_name", None, 2, "css", skipped=True)
+    loader.write_to_stats("field_name", None, 3, "css", name="name", skipped=True)
+
+    loader.stats.inc_value.assert_has_calls(
+        [
+            mock.call("parser/ItemLoader/field_name/css/2/skipped"),
+            mock.call("parser/ItemLoader/field_name/css/3/name/skipped"),
+        ]
+    )
+
+
+def test_multiple_groups_positions(loader):
+    """Each rule in a group occupies its own position."""
+
+    loader.add_css("title", ["h1::text", "article h2::text"])
+    loader.add_css("title", ["h3::text", "article .product-title::text"])
+    loader.add_css("title", "title::text")
+    loader.stats.inc_value.assert_has_calls(
+        [
+            mock.call("parser/TestItemLoader/title/css/1/missing"),
+            mock.call("parser/TestItemLoader/title/css/2"),
+            mock.call("parser/TestItemLoader/title/css/3/missing"),
+            mock.call("parser/TestItemLoader/title/css/4"),
+            mock.call("parser/TestItemLoader/title/css/5"),
+        ]
+    )
+    assert loader.stats.inc_value.call_count == 5
+
+
+def test_replace_css_group_positions(loader):
+    """Replacing the values with a group doesn't move the next positions."""
+
+    loader.add_css("title", "article h2::text")
+    loader.replace_css("title", ["h1::text", "article h2::text"])
+    loader.add_css("title", "title::text")
+    loader.stats.inc_value.assert_has_calls(
+        [
+            mock.call("parser/TestItemLoader/title/css/1"),
+            mock.call("parser/TestItemLoader/title/css/1/missing"),
+            mock.call("parser/TestItemLoader/title/css/2"),
+            mock.call("parser/TestItemLoader/title/css/2"),
+        ]
+    )
+    assert loader.stats.inc_value.call_count == 4
+
+
+def test_add_css_first_match(loader):
+    loader.add_css(
+        "title",
+        ["h1::text", "article h2::text", "article .product-title::text"],
+        first_match=True,
+    )
+    loader.stats.inc_value.assert_has_calls(
+        [
+            mock.call("parser/TestItemLoader/title/css/1/missing"),
+            mock.call("parser/TestItemLoader/title/css/2"),
+            mock.call("parser/TestItemLoader/title/css/3/skipped"),
+        ]
+    )
+    assert loader.stats.inc_value.call_count == 3
+    assert loader.get_output_value("title") == ["Product #1"]
+
+
+def test_add_xpath_first_match_class_default():
+    class FirstMatchItemLoader(TestItemLoader):
+        first_match = True
+
+    loader = FirstMatchItemLoader(response=RESPONSE, stats=mock.MagicMock())
+    loader.add_xpath("title", ["//article/h2/text()", "//article/div/text()"])
+
+    loader.stats.inc_value.assert_has_calls(
+        [
+            mock.call("parser/FirstMatchItemLoader/title/xpath/1"),
+            mock.call("parser/FirstMatchItemLoader/title/xpath/2/skipped"),
+        ]
+    )
+    assert loader.get_output_value("title") == ["Product #1"]
+
+    # It can still be disabled per call.
+    loader.add_xpath(
+        "title", ["//article/h2/text()", "//article/div/text()"], first_match=False
+    )
+    assert loader.get_output_value("title") == [
+        "Product #1",
+        "Product #1",
+        "Product #2",
+    ]
+
+
+def test_nested_css(loader):
+    """The nested loaders share the stats and the positions of their parent."""
+
+    loader.add_css("title", "h1::text")
+    nested = loader.nested_css("article")
+    assert nested.stats is loader.stats
+    assert nested.field_tracker is loader.field_tracker
+
+    nested.add_css("title", ["h2::text", ".product-title::text"])
+    nested.nested_xpath("./div").add_xpath("title", "text()")
+    loader.add_css("title", "title::text")
+
+    loader.stats.inc_value.assert_has_calls(
+        [
+            mock.call("parser/TestItemLoader/title/css/1/missing"),
+            mock.call("parser/TestItemLoader/title/css/2"),
+            mock.call("parser/TestItemLoader/title/css/3"),
+            mock.call("parser/TestItemLoader/title/xpath/1"),
+            mock.call("parser/TestItemLoader/title/css/4"),
+        ]
+    )
+    assert loader.stats.inc_value.call_count == 5
+
+
+def test_nested_buffered_stats():
+    class BufferedItemLoader(TestItemLoader):
+        buffered_stats = True
+
+    stats = mock.MagicMock(spec=["inc_value"])
+    loader = BufferedItemLoader(response=RESPONSE, stats=stats)
+    nested = loader.nested_css("article")
+    assert nested.stats_buffer is loader.stats_buffer
+
+    nested.add_css("title", "h2::text")
+    assert not stats.inc_value.called
+
+    loader.load_item()
+    stats.inc_value.assert_called_once_with("parser/BufferedItemLoader/title/css/1", 1)
+
+
+def test_reset():
+    """A reset loader must behave the same as a new one."""
+
+    def populate(loader):
+        loader.add_css("title", ["h1::text", "h2::text"])
+        loader.add_xpath("title", "./div/text()", name="div")
+        return loader.load_item()
+
+    rows = RESPONSE.css("article")
+    fresh_stats, reset_stats = mock.MagicMock(), mock.MagicMock()
+
+    fresh_items = [
+        populate(TestItemLoader(selector=row, stats=fresh_stats)) for row in rows
+    ]
+
+    loader = TestItemLoader(stats=reset_stats)
+    reset_items = [populate(loader.reset(selector=row)) for row in rows]
+
+    assert reset_items == fresh_items
+    assert reset_items[0] is not reset_items[1]
+    assert reset_stats.inc_value.call_args_list == (
+        fresh_stats.inc_value.call_args_list
+    )
+
+    # The item and response are reset as well.
+    item = TestItem(title="Initial")
+    loader.reset(response=RESPONSE, item=item)
+    assert loader.context["response"] is RESPONSE
+    loader.add_css("title", "article h2::text")
+    assert loader.load_item() is item
+    assert item["title"] == ["Initial", "Product #1"]
+
+    nested = loader.nested_css("article")
+    with pytest.raises(RuntimeError):
+        nested.reset()
@@ -0,0 +1,67 @@
+from unittest import mock
+
+from scrapy_loader_upkeep.memo import RuleMemo
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+class MemoItemLoader(TestItemLoader):
+    memoize_rules = True
+
+
+def test_rule_memo():
+    memo = RuleMemo()
+    evaluate = mock.Mock(return_value=["data"])
+    selector, other = object(), object()
+
+    assert memo.extract(selector, "css", evaluate, "h2") == ["data"]
+    assert memo.extract(selector, "css", evaluate, "h2") == ["data"]
+    assert memo.extract(selector, "xpath", evaluate, "h2") == ["data"]
+    assert memo.extract(other, "css", evaluate, "h2") == ["data"]
+    assert evaluate.call_count == 3
+    assert (memo.hits, memo.misses, len(memo)) == (1, 3, 3)
+
+    memo.clear()
+    assert (memo.hits, memo.misses, len(memo)) == (0, 0, 0)
+
+
+def test_loader_memo():
+    stats = mock.MagicMock()
+    loader = MemoItemLoader(response=RESPONSE, stats=stats)
+
+    with mock.patch.object(
+        loader.selector_cache, "extract", wraps=loader.selector_cache.extract
+    ) as extract:
+        loader.add_css("title", ["h1::text", "article h2::text"])
+        loader.add_css("title", "article h2::text")
+        loader.replace_css("title", "article h2::text")
+        assert loader.get_css("h1::text") == []
+    assert extract.call_count == 2
+
+    # The stats are logged the same way as without the memo.
+    assert stats.inc_value.call_args_list == [
+        mock.call("parser/MemoItemLoader/title/css/1/missing"),
+        mock.call("parser/MemoItemLoader/title/css/2"),
+        mock.call("parser/MemoItemLoader/title/css/3"),
+        mock.call("parser/MemoItemLoader/title/css/3"),
+    ]
+
+    item = loader.load_item()
+    assert item["title"] == ["Product #1"]
+    stats.inc_value.assert_any_call("upkeep/memo/hits", 3)
+    stats.inc_value.assert_any_call("upkeep/memo/misses", 2)
+    assert len(loader.rule_memo) == 0
+
+
+def test_nested_loader_memo():
+    loader = MemoItemLoader(response=RESPONSE)
+    nested = loader.nested_css("article")
+    assert nested.rule_memo is loader.rule_memo
+
+    # The selectors of the nested loader aren't mistaken for the parent's.
+    loader.add_css("title", "h2::text")
+    nested.add_css("title", "h2::text")
+    nested.add_css("title", "h2::text")
+    assert loader.rule_memo.hits == 1
+    assert loader.load_item()["title"] == ["Product #1"] * 3
+
+    assert TestItemLoader(response=RESPONSE).rule_memo is None
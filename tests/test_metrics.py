@@ -0,0 +1,94 @@
+from unittest import mock
+from urllib.error import HTTPError
+from urllib.request import urlopen
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+
+from scrapy_loader_upkeep import ItemLoader
+from scrapy_loader_upkeep.extensions import OpenMetricsExporter
+from scrapy_loader_upkeep.metrics import MetricsServer, RuleMetrics
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+def test_render():
+    metrics = RuleMetrics(max_series=2)
+    metrics.record("Loader", "title", "css", 1, None, "missing")
+    metrics.record("Loader", "title", "css", 1, None, "missing")
+    metrics.record("Loader", "title", "css", 2, 'a "b"', "hit")
+    metrics.record("Loader", "title", "css", 3, None, "hit")
+
+    assert metrics.render() == (
+        "# TYPE upkeep_parser_rule counter\n"
+        "# HELP upkeep_parser_rule The evaluations of the parser rules.\n"
+        'upkeep_parser_rule_total{loader="Loader",field="title",type="css",'
+        'position="1",status="missing"} 2\n'
+        'upkeep_parser_rule_total{loader="Loader",field="title",type="css",'
+        'position="2",name="a \\"b\\"",status="hit"} 1\n'
+        "# TYPE upkeep_parser_rule_dropped counter\n"
+        "# HELP upkeep_parser_rule_dropped The evaluations of the parser rules "
+        "beyond the limit of series.\n"
+        "upkeep_parser_rule_dropped_total 1\n"
+        "# EOF\n"
+    )
+
+    metrics.clear()
+    assert len(metrics) == 0
+    assert metrics.dropped == 0
+
+
+def test_loader_rule_metrics():
+    class MetricsItemLoader(TestItemLoader):
+        rule_metrics = RuleMetrics()
+
+    # The metrics don't depend on the stats.
+    loader = MetricsItemLoader(response=RESPONSE)
+    loader.add_css("title", ["h1::text", "h2::text", "h3::text"], first_match=True)
+    loader.get_css("h2::text")
+
+    assert MetricsItemLoader.rule_metrics.counters == {
+        ("MetricsItemLoader", "title", "css", 1, None, "missing"): 1,
+        ("MetricsItemLoader", "title", "css", 2, None, "hit"): 1,
+        ("MetricsItemLoader", "title", "css", 3, None, "skipped"): 1,
+    }
+
+
+def test_server():
+    metrics = RuleMetrics()
+    metrics.record("Loader", "title", "css", 1, None, "hit")
+    server = MetricsServer(metrics, port=0)
+    server.start()
+    try:
+        url = f"http://127.0.0.1:{server.port}"
+        with urlopen(f"{url}/metrics") as response:
+            assert response.headers["Content-Type"].startswith(
+                "application/openmetrics-text"
+            )
+            body = response.read().decode("utf-8")
+        assert 'status="hit"} 1\n' in body
+        assert body.endswith("# EOF\n")
+
+        with pytest.raises(HTTPError):
+            urlopen(f"{url}/other")
+    finally:
+        server.stop()
+
+
+def test_extension():
+    with pytest.raises(NotConfigured):
+        OpenMetricsExporter.from_crawler(mock.Mock(settings=Settings()))
+
+    settings = Settings({"UPKEEP_METRICS_PORT": 0, "UPKEEP_METRICS_MAX_SERIES": 5})
+    extension = OpenMetricsExporter.from_crawler(mock.Mock(settings=settings))
+    assert extension.server.metrics.max_series == 5
+    assert ItemLoader.rule_metrics is None
+
+    extension.spider_opened(None)
+    try:
+        assert ItemLoader.rule_metrics is extension.server.metrics
+        with urlopen(f"http://127.0.0.1:{extension.server.port}/metrics") as response:
+            assert response.status == 200
+    finally:
+        extension.spider_closed(None)
+    assert ItemLoader.rule_metrics is None
@@ -0,0 +1,133 @@
+import json
+from unittest import mock
+
+import pytest
+from scrapy import Field, Item
+
+from scrapy_loader_upkeep import ItemLoader, Rules
+from scrapy_loader_upkeep.cache import SelectorCache
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+class ProductItem(Item):
+    title = Field()
+    price = Field()
+
+
+class ProductItemLoader(ItemLoader):
+    default_item_class = ProductItem
+
+    title = Rules(css=["h1::text", "article h2::text"], first_match=True)
+    price = Rules(xpath="//span[@class='price']/text()", name="price")
+
+
+def test_plan():
+    assert ProductItemLoader._plan == (
+        ("title", "css", ("h1::text", "article h2::text"), {"first_match": True}),
+        ("price", "xpath", ("//span[@class='price']/text()",), {"name": "price"}),
+    )
+
+    # The stat labels are ready before any item is loaded.
+    labels = ProductItemLoader._stat_labels
+    assert labels[("ProductItemLoader", "title", "css", 2, None, "skipped")] == (
+        "parser/ProductItemLoader/title/css/2/skipped"
+    )
+    assert ("ProductItemLoader", "price", "xpath", 1, "price", "missing") in labels
+
+
+def test_load():
+    stats = mock.MagicMock()
+    item = ProductItemLoader(response=RESPONSE, stats=stats).load()
+
+    assert item == {"title": ["Product #1"], "price": ["$1.23", "$9.99"]}
+    assert stats.inc_value.call_args_list == [
+        mock.call("parser/ProductItemLoader/title/css/1/missing"),
+        mock.call("parser/ProductItemLoader/title/css/2"),
+        mock.call("parser/ProductItemLoader/price/xpath/1/price"),
+    ]
+
+
+def test_plan_pinned_rules():
+    """The plan's rules are compiled for every type of document and are never
+    evicted by the other rules.
+    """
+
+    class PinnedItemLoader(ProductItemLoader):
+        selector_cache = SelectorCache(maxsize=1)
+
+    cache = PinnedItemLoader.selector_cache
+    assert cache.info()["pinned"] == 6
+    for selector_type in ("html", "xml"):
+        compiled = cache.get("css", selector_type, "h1::text")
+        assert compiled is cache.pin("css", selector_type, "h1::text")
+
+    cache.get("css", "html", "h2")
+    cache.get("css", "html", "h3")
+    assert cache.evictions == 1
+
+    stats = mock.MagicMock()
+    PinnedItemLoader(response=RESPONSE, stats=stats).load()
+    assert cache.misses == 2
+    assert len(cache) == 1
+
+
+def test_extraction_plan_spec():
+    class SpecItemLoader(TestItemLoader):
+        extraction_plan = json.dumps(
+            {
+                "title": [
+                    {"css": "h1::text"},
+                    {"css": ["article h2::text"], "xpath": "//article/div/text()"},
+                ]
+            }
+        )
+
+    assert SpecItemLoader._plan == (
+        ("title", "css", ("h1::text",), {}),
+        ("title", "css", ("article h2::text",), {}),
+        ("title", "xpath", ("//article/div/text()",), {}),
+    )
+
+    stats = mock.MagicMock()
+    item = SpecItemLoader(response=RESPONSE, stats=stats).load()
+    assert item["title"] == ["Product #1", "Product #2"]
+    assert stats.inc_value.call_args_list == [
+        mock.call("parser/SpecItemLoader/title/css/1/missing"),
+        mock.call("parser/SpecItemLoader/title/css/2"),
+        mock.call("parser/SpecItemLoader/title/xpath/1"),
+    ]
+
+    # The plan is inherited, and can be extended with new fields.
+    class ExtendedItemLoader(ProductItemLoader):
+        price = Rules(css=".price::text")
+
+    assert [step[:2] for step in ExtendedItemLoader._plan] == [
+        ("title", "css"),
+        ("price", "css"),
+    ]
+
+
+@pytest.mark.parametrize(
+    "attrs, message",
+    [
+        ({"title": Rules(css="h1::text[")}, "Invalid css rule 'h1::text\\['"),
+        ({"title": Rules(xpath="//h1[")}, "Invalid xpath rule '//h1\\['"),
+        ({"extraction_plan": {"name": {"css": "h1"}}}, "'name' field which isn't"),
+        ({"extraction_plan": {"title": {"cs": "h1"}}}, "Unknown keys"),
+        ({"extraction_plan": {"title": {"css": []}}}, "non-empty list"),
+        ({"extraction_plan": ["title"]}, "must be a dict"),
+        ({"item": Rules(css="h1")}, "shadows an attribute"),
+    ],
+)
+def test_invalid_plan(attrs, message):
+    with pytest.raises(ValueError, match=message):
+        type("InvalidItemLoader", (TestItemLoader,), attrs)
+
+
+def test_invalid_rules():
+    with pytest.raises(ValueError, match="Either the 'css' or 'xpath'"):
+        Rules()
+    with pytest.raises(ValueError, match="'name' must be a string"):
+        Rules(css="h1", name=1)
+    with pytest.raises(ValueError, match="'first_match' must be a bool"):
+        Rules(css="h1", first_match="yes")
@@ -0,0 +1,96 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from unittest import mock
+
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapy_loader_upkeep.pool import ProcessExtractor, run_loader
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+def populate(loader):
+    loader.add_css("title", ["h1::text", "article h2::text"])
+    loader.add_xpath("title", "//article/div/text()", name="div")
+
+
+def populate_error(loader):
+    raise ValueError("Broken populate function")
+
+
+def test_run_loader():
+    item, counts = run_loader(
+        TestItemLoader,
+        populate,
+        RESPONSE.__class__,
+        RESPONSE.url,
+        RESPONSE.body,
+        RESPONSE.encoding,
+        {},
+    )
+    assert item["title"] == ["Product #1", "Product #2"]
+    assert counts == {
+        "parser/TestItemLoader/title/css/1/missing": 1,
+        "parser/TestItemLoader/title/css/2": 1,
+        "parser/TestItemLoader/title/xpath/1/div": 1,
+    }
+
+
+def make_extractor(stats, max_pending=2):
+    extractor = ProcessExtractor(
+        stats, max_pending=max_pending, executor=ProcessPoolExecutor(2)
+    )
+    # There's no running reactor in the tests.
+    extractor.call_from_thread = lambda f, *args: f(*args)
+    return extractor
+
+
+def wait(deferreds):
+    results = []
+    done = threading.Event()
+    for deferred in deferreds:
+        deferred.addBoth(results.append)
+        deferred.addBoth(lambda _: len(results) == len(deferreds) and done.set())
+    assert done.wait(timeout=30)
+    return results
+
+
+def test_extract():
+    """The stats must be the same as when loading the items in process."""
+
+    in_process_stats = MemoryStatsCollector(get_crawler())
+    for _ in range(5):
+        loader = TestItemLoader(response=RESPONSE, stats=in_process_stats)
+        populate(loader)
+        loader.load_item()
+
+    stats = MemoryStatsCollector(get_crawler())
+    extractor = make_extractor(stats)
+    try:
+        items = wait(
+            [extractor.extract(RESPONSE, TestItemLoader, populate) for _ in range(5)]
+        )
+    finally:
+        extractor.executor.shutdown()
+
+    assert [item["title"] for item in items] == [["Product #1", "Product #2"]] * 5
+    assert stats.get_stats() == in_process_stats.get_stats()
+
+
+def test_extract_back_pressure():
+    extractor = make_extractor(None, max_pending=1)
+    with mock.patch.object(extractor.executor, "submit") as submit:
+        extractor.extract(RESPONSE, TestItemLoader, populate)
+        extractor.extract(RESPONSE, TestItemLoader, populate)
+        assert submit.call_count == 1
+    extractor.executor.shutdown()
+
+
+def test_extract_error():
+    extractor = make_extractor(None)
+    try:
+        (failure,) = wait([extractor.extract(RESPONSE, TestItemLoader, populate_error)])
+    finally:
+        extractor.executor.shutdown()
+
+    assert failure.check(ValueError)
@@ -0,0 +1,111 @@
+import logging
+from unittest import mock
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+
+from scrapy_loader_upkeep import ItemLoader
+from scrapy_loader_upkeep.extensions import RuleUsageReport
+from scrapy_loader_upkeep.registry import RuleRegistry
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+def test_get_id():
+    registry = RuleRegistry(capacity=2)
+
+    assert registry.get_id("Loader", "title", "css", 1) == 0
+    assert registry.get_id("Loader", "title", "css", 1, "name") == 1
+    assert registry.get_id("Loader", "title", "xpath", 1) == 2
+    assert registry.get_id("Loader", "title", "css", 1) == 0
+    assert len(registry) == 3
+
+    # The arrays grow as needed.
+    assert len(registry.hits) == len(registry.misses) == len(registry.skips) == 4
+
+    assert registry.get_label(1) == "parser/Loader/title/css/1/name"
+
+
+def test_report():
+    registry = RuleRegistry()
+    dead = registry.get_id("Loader", "title", "css", 1)
+    deader = registry.get_id("Loader", "title", "css", 2)
+    skipped = registry.get_id("Loader", "title", "css", 3)
+    rare = registry.get_id("Loader", "price", "css", 1)
+    used = registry.get_id("Loader", "price", "css", 2)
+
+    registry.record(dead, [])
+    for _ in range(3):
+        registry.record(deader, None)
+        registry.record(skipped, None, skipped=True)
+    registry.record(rare, ["data"])
+    for _ in range(200):
+        registry.record(rare, [])
+        registry.record(used, ["data"])
+
+    assert registry.report() == [
+        ("dead", "parser/Loader/title/css/2", 0, 3, 0),
+        ("dead", "parser/Loader/title/css/1", 0, 1, 0),
+        ("skipped", "parser/Loader/title/css/3", 0, 0, 3),
+        ("rare", "parser/Loader/price/css/1", 1, 200, 0),
+    ]
+    assert [row[0] for row in registry.report(rare_ratio=0.001)] == [
+        "dead",
+        "dead",
+        "skipped",
+    ]
+
+    registry.clear()
+    assert len(registry) == 0
+    assert registry.report() == []
+    assert not any(registry.hits)
+
+
+def test_loader_rule_registry():
+    class RegistryItemLoader(TestItemLoader):
+        rule_registry = RuleRegistry()
+
+    loader = RegistryItemLoader(response=RESPONSE)
+    loader.add_css("title", ["h1::text", "article h2::text"], name="title")
+    loader.add_css("title", ["h2::text", "h3::text"], first_match=True)
+    loader.get_css("h2::text")
+
+    registry = RegistryItemLoader.rule_registry
+    assert [registry.get_label(rule_id) for rule_id in range(len(registry))] == [
+        "parser/RegistryItemLoader/title/css/1/title",
+        "parser/RegistryItemLoader/title/css/2/title",
+        "parser/RegistryItemLoader/title/css/3",
+        "parser/RegistryItemLoader/title/css/4",
+    ]
+    assert list(registry.hits[:4]) == [0, 1, 1, 0]
+    assert list(registry.misses[:4]) == [1, 0, 0, 0]
+    assert list(registry.skips[:4]) == [0, 0, 0, 1]
+
+
+def test_extension(caplog):
+    with pytest.raises(NotConfigured):
+        RuleUsageReport.from_crawler(mock.Mock(settings=Settings()))
+
+    crawler = mock.Mock(settings=Settings({"UPKEEP_RULE_REPORT_ENABLED": True}))
+    extension = RuleUsageReport.from_crawler(crawler)
+    assert ItemLoader.rule_registry is None
+
+    extension.spider_opened(None)
+    try:
+        assert ItemLoader.rule_registry is extension.registry
+        loader = TestItemLoader(response=RESPONSE)
+        loader.add_css("title", ["h1::text", "article h2::text"])
+    finally:
+        with caplog.at_level(logging.INFO):
+            extension.spider_closed(None)
+    assert ItemLoader.rule_registry is None
+
+    crawler.stats.set_value.assert_has_calls(
+        [
+            mock.call("upkeep/rules/dead", 1),
+            mock.call("upkeep/rules/skipped", 0),
+            mock.call("upkeep/rules/rare", 0),
+        ]
+    )
+    assert "1 of the 2 parser rules might be obsolete" in caplog.text
+    assert "DEAD     parser/TestItemLoader/title/css/1 (hits=0" in caplog.text
@@ -0,0 +1,165 @@
+from unittest import mock
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.http import TextResponse
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapy_loader_upkeep import ItemLoader
+from scrapy_loader_upkeep.extensions import StatsSampling
+from scrapy_loader_upkeep.registry import RuleRegistry
+from scrapy_loader_upkeep.snapshots import registry_rules
+from scrapy_loader_upkeep.volume import RuleVolumes
+from scrapy_loader_upkeep.windows import RuleWindows
+from tests.helpers import TEST_HTML_BODY, TestItemLoader
+
+
+class SampledItemLoader(TestItemLoader):
+    stats_sample_rate = 0.25
+
+
+def make_response(index):
+    return TextResponse(
+        f"https://test.com/{index}", body=TEST_HTML_BODY, encoding="utf-8"
+    )
+
+
+def test_get_stats_weight():
+    assert TestItemLoader(response=make_response(0)).stats_weight == 1
+    # Without any URL to hash.
+    assert SampledItemLoader().stats_weight == 1
+
+    weights = [
+        SampledItemLoader(response=make_response(index)).stats_weight
+        for index in range(1000)
+    ]
+    assert set(weights) == {None, 4}
+    assert 200 < weights.count(4) < 300
+
+    # It's deterministic.
+    assert weights == [
+        SampledItemLoader(response=make_response(index)).stats_weight
+        for index in range(1000)
+    ]
+
+    # The loaders of the rows in a page share the same decision.
+    response = make_response(0)
+    assert {
+        SampledItemLoader(selector=row).stats_weight for row in response.css("article")
+    } == {SampledItemLoader(response=response).stats_weight}
+
+
+def test_sampled_stats():
+    class DeadRuleItemLoader(SampledItemLoader):
+        pass
+
+    stats = MemoryStatsCollector(get_crawler())
+    sampled = 0
+    for index in range(400):
+        loader = DeadRuleItemLoader(response=make_response(index), stats=stats)
+        loader.add_css("title", ["h1::text", "article h2::text"])
+        sampled += loader.stats_weight is not None
+
+    samples = stats.get_value("parser/DeadRuleItemLoader/title/css/1/missing/samples")
+    assert samples == sampled
+    assert stats.get_value("parser/DeadRuleItemLoader/title/css/2/samples") == sampled
+    assert stats.get_value("parser/DeadRuleItemLoader/title/css/1/missing") == (
+        sampled * 4
+    )
+    # The first hit of the rule is logged apart if it's been produced by an
+    # unsampled loader, instead of being added into the estimate.
+    assert stats.get_value("parser/DeadRuleItemLoader/title/css/2") == sampled * 4
+    assert stats.get_value("parser/DeadRuleItemLoader/title/css/2/observed") in (
+        None,
+        1,
+    )
+    assert "parser/DeadRuleItemLoader/title/css/1" not in stats.get_stats()
+    assert "parser/DeadRuleItemLoader/title/css/1/observed" not in stats.get_stats()
+
+
+def test_unsampled_first_hits_are_exact():
+    """The rules producing data on unsampled loaders are still reported."""
+
+    class UnsampledItemLoader(TestItemLoader):
+        stats_sample_rate = 0.000001
+
+    stats = mock.Mock()
+    for index in range(3):
+        loader = UnsampledItemLoader(response=make_response(index), stats=stats)
+        assert loader.stats_weight is None
+        loader.add_css("title", ["h1::text", "article h2::text"])
+        loader.add_css("title", "article .product-title::text")
+
+    assert stats.inc_value.call_args_list == [
+        mock.call("parser/UnsampledItemLoader/title/css/2/observed"),
+        mock.call("parser/UnsampledItemLoader/title/css/3/observed"),
+    ]
+
+
+def test_unsampled_loaders_skip_the_instrumentation():
+    class UnsampledItemLoader(TestItemLoader):
+        stats_sample_rate = 0.000001
+        track_volume = True
+        rule_volumes = RuleVolumes()
+        rule_registry = RuleRegistry()
+        rule_windows = RuleWindows()
+
+    expected = TestItemLoader(response=make_response(0))
+    expected.add_css("title", ["h1::text", "article h2::text"])
+
+    for _ in range(3):
+        loader = UnsampledItemLoader(response=make_response(0), stats=mock.Mock())
+        loader.add_css("title", ["h1::text", "article h2::text"])
+        assert loader.load_item() == expected.load_item()
+
+    assert loader.rule_volumes.volumes == {}
+    assert loader.rule_windows.windows == {}
+
+    # Only the first hit of the rule is recorded in the registry.
+    assert list(registry_rules(loader.rule_registry)) == [
+        ("parser/UnsampledItemLoader/title/css/2", 1, 0, 0),
+    ]
+
+
+def test_unsampled_hits_in_rule_report():
+    """A rule which only produced data in the unsampled loaders isn't dead."""
+
+    class ReportItemLoader(TestItemLoader):
+        stats_sample_rate = 0.5
+        rule_registry = RuleRegistry()
+
+    responses = [make_response(index) for index in range(20)]
+    weights = [ReportItemLoader(response=r).stats_weight for r in responses]
+    sampled = responses[weights.index(2)]
+    unsampled = responses[weights.index(None)]
+
+    for response in (sampled, unsampled):
+        loader = ReportItemLoader(response=response, stats=mock.MagicMock())
+        rule = "article h2::text" if response is unsampled else "h1::text"
+        loader.add_css("title", rule)
+
+    assert ReportItemLoader.rule_registry.report() == []
+    assert list(registry_rules(ReportItemLoader.rule_registry)) == [
+        ("parser/ReportItemLoader/title/css/1", 1, 1, 0),
+    ]
+
+
+def test_extension():
+    for settings in ({}, {"UPKEEP_STATS_SAMPLE_RATE": 1}):
+        with pytest.raises(NotConfigured):
+            StatsSampling.from_crawler(mock.Mock(settings=Settings(settings)))
+
+    crawler = mock.Mock(settings=Settings({"UPKEEP_STATS_SAMPLE_RATE": 0.1}))
+    extension = StatsSampling.from_crawler(crawler)
+    assert ItemLoader.stats_sample_rate is None
+
+    extension.spider_opened(None)
+    try:
+        assert ItemLoader.stats_sample_rate == 0.1
+        assert TestItemLoader.stats_sample_rate == 0.1
+        assert SampledItemLoader.stats_sample_rate == 0.25
+    finally:
+        extension.spider_closed(None)
+    assert ItemLoader.stats_sample_rate is None
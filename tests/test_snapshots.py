@@ -0,0 +1,116 @@
+import gzip
+import json
+from unittest import mock
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+
+from scrapy_loader_upkeep import ItemLoader
+from scrapy_loader_upkeep.extensions import RuleUsageSnapshot
+from scrapy_loader_upkeep.snapshots import (
+    SnapshotError,
+    main,
+    merge_snapshots,
+    read_snapshot,
+    registry_rules,
+    write_snapshot,
+)
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+def test_write_and_read(tmp_path):
+    path = str(tmp_path / "snapshot.jsonl.gz")
+    rules = [
+        ("parser/Loader/title/css/1", 0, 10, 0),
+        ("parser/Loader/title/css/2", 10, 0, 0),
+    ]
+    write_snapshot(path, rules, spider="quotes")
+
+    with gzip.open(path, "rt") as f:
+        header = json.loads(f.readline())
+    assert header == {
+        "format": "scrapy-loader-upkeep/rule-usage",
+        "version": 1,
+        "spider": "quotes",
+    }
+    assert list(read_snapshot(path)) == rules
+    assert not (tmp_path / "snapshot.jsonl.gz.tmp").exists()
+
+
+def test_read_invalid(tmp_path):
+    path = tmp_path / "invalid.jsonl"
+    path.write_text("not a snapshot\n")
+    with pytest.raises(SnapshotError):
+        list(read_snapshot(str(path)))
+
+    path.write_text('{"format": "scrapy-loader-upkeep/rule-usage", "version": 99}\n')
+    with pytest.raises(SnapshotError, match="unsupported version: 99"):
+        list(read_snapshot(str(path)))
+
+
+def test_merge(tmp_path, capsys):
+    paths = []
+    for index in range(3):
+        path = str(tmp_path / f"{index}.jsonl")
+        write_snapshot(
+            path,
+            [
+                ("parser/Loader/title/css/1", 0, 10, 0),
+                ("parser/Loader/title/css/2", 10, 0, 0),
+                (f"parser/Loader/price/css/{index + 1}", 1, 3, 0),
+            ],
+        )
+        paths.append(path)
+
+    assert merge_snapshots(paths) == {
+        "parser/Loader/title/css/1": [0, 30, 0],
+        "parser/Loader/title/css/2": [30, 0, 0],
+        "parser/Loader/price/css/1": [1, 3, 0],
+        "parser/Loader/price/css/2": [1, 3, 0],
+        "parser/Loader/price/css/3": [1, 3, 0],
+    }
+
+    # The directories are expanded into the snapshots inside them.
+    output = str(tmp_path / "merged.jsonl.gz")
+    main([str(tmp_path), "--sort", "ratio", "--output", output])
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "Merged 3 snapshots with 5 rules."
+    assert lines[1] == (
+        "parser/Loader/title/css/1  hits=0 missing=30 skipped=0 ratio=0.00%"
+    )
+    assert lines[-1] == (
+        "parser/Loader/title/css/2  hits=30 missing=0 skipped=0 ratio=100.00%"
+    )
+
+    # The merged snapshot can be merged again.
+    assert merge_snapshots([output]) == merge_snapshots(paths)
+
+
+def test_extension(tmp_path):
+    with pytest.raises(NotConfigured):
+        RuleUsageSnapshot.from_crawler(mock.Mock(settings=Settings()))
+
+    path = str(tmp_path / "snapshots" / "%(name)s-%(pid)s.jsonl")
+    crawler = mock.Mock(settings=Settings({"UPKEEP_SNAPSHOT_PATH": path}))
+    extension = RuleUsageSnapshot.from_crawler(crawler)
+    assert ItemLoader.rule_registry is None
+
+    spider = mock.Mock()
+    spider.name = "quotes"
+    extension.spider_opened(spider)
+    try:
+        assert ItemLoader.rule_registry is extension.registry
+        loader = TestItemLoader(response=RESPONSE)
+        loader.add_css("title", ["h1::text", "article h2::text"])
+    finally:
+        with mock.patch("os.getpid", return_value=123):
+            extension.spider_closed(spider)
+    assert ItemLoader.rule_registry is None
+
+    snapshot = str(tmp_path / "snapshots" / "quotes-123.jsonl")
+    assert list(read_snapshot(snapshot)) == list(registry_rules(extension.registry))
+    assert list(read_snapshot(snapshot)) == [
+        ("parser/TestItemLoader/title/css/1", 0, 1, 0),
+        ("parser/TestItemLoader/title/css/2", 1, 0, 0),
+    ]
@@ -0,0 +1,279 @@
+import sys
+import threading
+from contextlib import contextmanager
+from unittest import mock
+
+from scrapy import signals
+from scrapy.settings import Settings
+from scrapy.statscollectors import MemoryStatsCollector
+from scrapy.utils.test import get_crawler
+
+from scrapy_loader_upkeep.stats import ShardedStats, StatsBuffer
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+class BufferedItemLoader(TestItemLoader):
+    buffered_stats = True
+
+
+def load(loader_cls, stats):
+    loader = loader_cls(response=RESPONSE, stats=stats)
+    loader.add_css("title", ["h1::text", "article h2::text"])
+    loader.add_css("title", "article h2::text")
+    loader.add_xpath("title", "//article/h2/text()", name="h2")
+    return loader
+
+
+def get_stats():
+    return MemoryStatsCollector(get_crawler())
+
+
+def test_buffered_loader_totals():
+    """The stats must be the same as when not buffering them."""
+
+    unbuffered_stats, buffered_stats = get_stats(), get_stats()
+
+    for _ in range(3):
+        load(TestItemLoader, unbuffered_stats).load_item()
+
+        before = dict(buffered_stats.get_stats())
+        loader = load(BufferedItemLoader, buffered_stats)
+        assert buffered_stats.get_stats() == before
+        loader.load_item()
+
+    expected = {
+        "parser/TestItemLoader/title/css/1/missing": 3,
+        "parser/TestItemLoader/title/css/2": 3,
+        "parser/TestItemLoader/title/css/3": 3,
+        "parser/TestItemLoader/title/xpath/1/h2": 3,
+    }
+    assert unbuffered_stats.get_stats() == expected
+    assert buffered_stats.get_stats() == {
+        key.replace("TestItemLoader", "BufferedItemLoader"): value
+        for key, value in expected.items()
+    }
+
+
+def test_buffered_loader_single_call():
+    """Each distinct stat label is only pushed once per item."""
+
+    stats = mock.Mock(spec=["inc_value"])
+    loader = load(BufferedItemLoader, stats)
+    loader.add_css("title", "article h2::text")
+    loader.load_item()
+
+    stats.inc_value.assert_any_call("parser/BufferedItemLoader/title/css/3", 1)
+    stats.inc_value.assert_any_call("parser/BufferedItemLoader/title/css/4", 1)
+    assert stats.inc_value.call_count == 5
+
+    # Nothing is pushed twice.
+    loader.load_item()
+    assert stats.inc_value.call_count == 5
+
+
+def test_stats_buffer_flush_items():
+    stats = get_stats()
+    stats_buffer = StatsBuffer(stats, flush_items=2)
+
+    load(BufferedItemLoader, stats_buffer).load_item()
+    assert stats.get_stats() == {}
+
+    load(BufferedItemLoader, stats_buffer).load_item()
+    assert stats.get_value("parser/BufferedItemLoader/title/css/2") == 2
+    assert stats_buffer.counts == {}
+
+
+def test_stats_buffer_flush_interval():
+    stats = get_stats()
+
+    with mock.patch("scrapy_loader_upkeep.stats.time.monotonic") as monotonic:
+        monotonic.return_value = 1000
+        stats_buffer = StatsBuffer(stats, flush_interval=60)
+
+        monotonic.return_value = 1059
+        stats_buffer.inc_values({"a": 1})
+        assert stats.get_stats() == {}
+
+        # The buffer is flushed as soon as the interval has elapsed.
+        monotonic.return_value = 1060
+        stats_buffer.inc_values({"a": 2})
+        assert stats.get_stats() == {"a": 3}
+
+
+def test_stats_buffer_flush_interval_unbuffered_loader():
+    """The loaders without 'buffered_stats' push one stat at a time, which
+    is still flushed once the interval has elapsed.
+    """
+
+    stats = get_stats()
+
+    with mock.patch("scrapy_loader_upkeep.stats.time.monotonic") as monotonic:
+        monotonic.return_value = 1000
+        stats_buffer = StatsBuffer(stats, flush_items=2, flush_interval=60)
+
+        monotonic.return_value = 1059
+        for _ in range(10):
+            load(TestItemLoader, stats_buffer).load_item()
+        assert stats.get_stats() == {}
+
+        # The first stat of the next item is pushed along with all of the
+        # buffered ones, while the rest are buffered until the next flush.
+        monotonic.return_value = 1060
+        load(TestItemLoader, stats_buffer).load_item()
+        assert stats.get_value("parser/TestItemLoader/title/css/1/missing") == 11
+        assert stats.get_value("parser/TestItemLoader/title/css/2") == 10
+        assert stats_buffer.counts["parser/TestItemLoader/title/css/2"] == 1
+
+
+def test_stats_buffer_from_crawler():
+    crawler = mock.Mock(
+        settings=Settings(
+            {"UPKEEP_STATS_FLUSH_ITEMS": 10, "UPKEEP_STATS_FLUSH_INTERVAL": 1.5}
+        ),
+        stats=get_stats(),
+    )
+    stats_buffer = StatsBuffer.from_crawler(crawler)
+
+    crawler.signals.connect.assert_called_once_with(
+        stats_buffer.spider_closed, signal=signals.spider_closed
+    )
+
+    assert stats_buffer.flush_items == 10
+    assert stats_buffer.flush_interval == 1.5
+
+    stats_buffer.inc_value("a")
+    stats_buffer.inc_value("a", 2)
+    assert crawler.stats.get_stats() == {}
+
+    stats_buffer.spider_closed(None)
+    assert crawler.stats.get_stats() == {"a": 3}
+
+
+@contextmanager
+def contention():
+    """Makes the threads switch as often as possible."""
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        yield
+    finally:
+        sys.setswitchinterval(interval)
+
+
+def run_threads(target, count):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_sharded_stats_threads():
+    """No increment is lost when many threads load items and flush at once."""
+
+    threads, items = 8, 200
+    stats = get_stats()
+    sharded_stats = ShardedStats(stats)
+    done = threading.Event()
+
+    def work():
+        for _ in range(items):
+            load(TestItemLoader, sharded_stats).load_item()
+            load(BufferedItemLoader, sharded_stats).load_item()
+
+    def flush():
+        while not done.is_set():
+            sharded_stats.flush()
+
+    flusher = threading.Thread(target=flush)
+    with contention():
+        flusher.start()
+        run_threads(work, threads)
+        done.set()
+        flusher.join()
+
+    sharded_stats.flush()
+
+    total = threads * items
+    expected = {}
+    for loader_name in ("TestItemLoader", "BufferedItemLoader"):
+        expected.update(
+            {
+                f"parser/{loader_name}/title/css/1/missing": total,
+                f"parser/{loader_name}/title/css/2": total,
+                f"parser/{loader_name}/title/css/3": total,
+                f"parser/{loader_name}/title/xpath/1/h2": total,
+            }
+        )
+    assert stats.get_stats() == expected
+    assert sharded_stats.get_counts() == expected
+    assert len(sharded_stats.shards) == threads
+
+    # Nothing is pushed twice.
+    sharded_stats.flush()
+    assert stats.get_stats() == expected
+
+
+def test_sharded_stats_flush_deltas():
+    stats = get_stats()
+    sharded_stats = ShardedStats(stats)
+
+    sharded_stats.inc_value("a")
+    sharded_stats.inc_values({"a": 2, "b": 1})
+    sharded_stats.flush()
+    assert stats.get_stats() == {"a": 3, "b": 1}
+
+    sharded_stats.inc_value("b", 4)
+    run_threads(lambda: sharded_stats.inc_value("c"), 3)
+    sharded_stats.flush()
+    assert stats.get_stats() == {"a": 3, "b": 5, "c": 3}
+    assert len(sharded_stats.shards) == 4
+
+
+def test_sharded_stats_from_crawler():
+    crawler = mock.Mock(
+        settings=Settings({"UPKEEP_STATS_FLUSH_INTERVAL": 1.5}), stats=get_stats()
+    )
+    sharded_stats = ShardedStats.from_crawler(crawler)
+
+    crawler.signals.connect.assert_any_call(
+        sharded_stats.spider_opened, signal=signals.spider_opened
+    )
+    crawler.signals.connect.assert_any_call(
+        sharded_stats.spider_closed, signal=signals.spider_closed
+    )
+    assert sharded_stats.flush_interval == 1.5
+
+    with mock.patch("scrapy_loader_upkeep.stats.task.LoopingCall") as looping_call:
+        sharded_stats.spider_opened(None)
+    looping_call.assert_called_once_with(sharded_stats.flush)
+    sharded_stats.task.start.assert_called_once_with(1.5, now=False)
+
+    sharded_stats.inc_value("a")
+    sharded_stats.spider_closed(None)
+    sharded_stats.task.stop.assert_called_once_with()
+    assert crawler.stats.get_stats() == {"a": 1}
+
+
+def test_tracker_keys_threads():
+    """The keys handed out concurrently for a new loader class are distinct."""
+
+    class ThreadedItemLoader(TestItemLoader):
+        pass
+
+    barrier = threading.Barrier(8)
+    keys = []
+
+    def work():
+        barrier.wait()
+        for field_index in range(50):
+            keys.append(
+                ThreadedItemLoader.get_tracker_key(f"field{field_index}", "css")
+            )
+
+    with contention():
+        run_threads(work, 8)
+
+    assert sorted(set(keys)) == list(range(50))
+    assert len(ThreadedItemLoader._tracker_keys) == 50
@@ -0,0 +1,122 @@
+import sys
+import threading
+from unittest import mock
+
+from scrapy.selector import Selector
+
+from scrapy_loader_upkeep.cache import SelectorCache
+from scrapy_loader_upkeep.union import UnionRule, extract_union
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+class UnionItemLoader(TestItemLoader):
+    union_fallbacks = True
+
+
+def test_extract_union_same_as_each_rule():
+    selector = Selector(RESPONSE)
+    rules = ["//article/h2", "//span[@class='price']", "//h1", "//article/*"]
+
+    values = extract_union(SelectorCache(), selector, "xpath", rules)
+    assert values == [selector.xpath(rule).getall() for rule in rules]
+
+    articles = selector.css("article")
+    rules = ["h2", ".price", "div, h2"]
+    values = extract_union(SelectorCache(), articles, "css", rules)
+    assert values == [articles.css(rule).getall() for rule in rules]
+
+
+def test_extract_union_unsupported():
+    cache = SelectorCache()
+    selector = Selector(RESPONSE)
+    rules = ["//article/h2", "//article/h2/text()"]
+
+    assert extract_union(cache, selector, "xpath", rules) is None
+
+    # It's remembered so the union isn't attempted again.
+    union = cache.lookup(("union", "xpath", "html", tuple(rules)), None)
+    assert union.supported is False
+    assert union.evaluate(selector.root) is None
+
+    assert extract_union(cache, selector, "xpath", ["count(//a)", "//a"]) is None
+    assert UnionRule("xpath", "html", ["//[", "//a"]).supported is False
+
+
+def test_loader_union_fallbacks():
+    """Both the values and the stats must stay the same."""
+
+    rules = ["article h1", "article h2", "article .product-title"]
+
+    loader = TestItemLoader(response=RESPONSE, stats=mock.MagicMock())
+    union_loader = UnionItemLoader(response=RESPONSE, stats=mock.MagicMock())
+
+    for current in (loader, union_loader):
+        current.add_css("title", rules, name="titles")
+        current.add_css("title", rules[1:], first_match=True)
+        # Rules matching text are still evaluated one by one.
+        current.add_css("title", ["h1::text", "h2::text"])
+
+    assert union_loader.get_output_value("title") == loader.get_output_value("title")
+    assert [
+        call[0][0].replace("UnionItemLoader", "TestItemLoader")
+        for call in union_loader.stats.inc_value.call_args_list
+    ] == [call[0][0] for call in loader.stats.inc_value.call_args_list]
+
+
+def test_loader_union_fallbacks_single_rule():
+    loader = UnionItemLoader(response=RESPONSE)
+    assert loader.get_union_values(loader.selector.css, ["h2"]) is None
+    assert loader.get_union_values(loader.selector.css, ["h1", "h2"]) == [
+        [],
+        ["<h2>Product #1</h2>"],
+    ]
+
+
+def test_loader_union_fallbacks_first_match():
+    """The union isn't used when the rules after a match aren't evaluated."""
+
+    class AdaptiveItemLoader(UnionItemLoader):
+        adaptive_fallbacks = True
+
+    loader = UnionItemLoader(response=RESPONSE)
+    rules = ["h1", "h2"]
+    assert loader.get_union_values(loader.selector.css, rules, first_match=True) is None
+
+    loader = AdaptiveItemLoader(response=RESPONSE)
+    assert loader.get_union_values(loader.selector.css, rules) is None
+
+
+def test_union_rule_threads():
+    """The marks of concurrent evaluations of a shared union aren't mixed."""
+
+    union = UnionRule("xpath", "html", ["//h1", "//h2"])
+    documents = [
+        (Selector(text=f"<h{level}>{index}</h{level}>").root, level - 1, index)
+        for index in range(20)
+        for level in (1, 2)
+    ]
+    errors = []
+
+    def work():
+        for _ in range(50):
+            for root, rule_index, index in documents:
+                values = union.evaluate(root)
+                expected = [[], []]
+                expected[rule_index] = [
+                    f"<h{rule_index + 1}>{index}</h{rule_index + 1}>"
+                ]
+                if values != expected:
+                    errors.append(values)
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    assert errors == []
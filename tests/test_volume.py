@@ -0,0 +1,108 @@
+import logging
+from unittest import mock
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+
+from scrapy_loader_upkeep import ItemLoader
+from scrapy_loader_upkeep.extensions import ExtractionVolumeStats
+from scrapy_loader_upkeep.volume import RuleVolumes, rule_volumes, truncate_values
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+def test_observe():
+    volumes = RuleVolumes()
+    assert volumes.observe("label", ["abc", "de"], max_chars=5) == ["abc", "de"]
+    assert volumes.observe("label", ["abcdef"], max_chars=5) == ["abcdef"]
+    assert volumes.observe("label", ["abcdef", 1], max_chars=5, truncate=True) == [
+        "abcde"
+    ]
+    assert volumes.observe("other", []) == []
+
+    volume = volumes.volumes["label"]
+    assert volume.evaluations == 3
+    assert volume.values == 5
+    assert volume.chars == 17
+    assert volume.max_chars == 6
+    assert volume.over_budget == 2
+
+    assert [label for label, _ in volumes.over_budget()] == ["label"]
+
+    stats = mock.Mock()
+    volumes.dump(stats)
+    stats.set_value.assert_has_calls(
+        [
+            mock.call("label/volume/values", 5),
+            mock.call("label/volume/chars", 17),
+            mock.call("label/volume/max_chars", 6),
+            mock.call("label/volume/over_budget", 2),
+        ]
+    )
+
+
+def test_truncate_values():
+    assert truncate_values(["abc", 1, "def", "g"], 5) == ["abc", 1, "de"]
+    assert truncate_values(["abc"], 0) == []
+
+    # The original values are left untouched.
+    values = ["abcdef"]
+    truncate_values(values, 2)
+    assert values == ["abcdef"]
+
+
+def test_loader_track_volume():
+    class VolumeItemLoader(TestItemLoader):
+        track_volume = True
+        rule_volumes = RuleVolumes()
+        volume_max_chars = 5
+        volume_truncate = True
+
+    stats = mock.MagicMock()
+    loader = VolumeItemLoader(response=RESPONSE, stats=stats)
+    loader.add_css("title", ["h1::text", "article h2::text"])
+    loader.add_xpath("title", "//article", name="article")
+
+    assert loader.get_output_value("title") == ["Produ", "<arti"]
+    volumes = VolumeItemLoader.rule_volumes.volumes
+    assert volumes["parser/VolumeItemLoader/title/css/1"].evaluations == 1
+    assert volumes["parser/VolumeItemLoader/title/css/2"].chars == 10
+    assert volumes["parser/VolumeItemLoader/title/xpath/1/article"].values == 2
+
+    # The stats are the same whether truncated or not.
+    assert stats.inc_value.call_args_list == [
+        mock.call("parser/VolumeItemLoader/title/css/1/missing"),
+        mock.call("parser/VolumeItemLoader/title/css/2"),
+        mock.call("parser/VolumeItemLoader/title/xpath/1/article"),
+    ]
+
+
+def test_extension(caplog):
+    with pytest.raises(NotConfigured):
+        ExtractionVolumeStats.from_crawler(mock.Mock(settings=Settings()))
+
+    settings = Settings({"UPKEEP_VOLUME_ENABLED": True, "UPKEEP_VOLUME_MAX_CHARS": 20})
+    crawler = mock.Mock(settings=settings)
+    extension = ExtractionVolumeStats.from_crawler(crawler)
+    assert not ItemLoader.track_volume
+
+    extension.spider_opened(None)
+    try:
+        assert ItemLoader.track_volume
+        assert ItemLoader.rule_volumes is extension.volumes
+        assert ItemLoader.volume_max_chars == 20
+        assert not ItemLoader.volume_truncate
+
+        extension.volumes.observe("parser/Loader/title/xpath/1", ["x" * 30], 20)
+        extension.volumes.observe("parser/Loader/title/xpath/2", ["x" * 10], 20)
+    finally:
+        with caplog.at_level(logging.WARNING):
+            extension.spider_closed(None)
+
+    assert not ItemLoader.track_volume
+    assert ItemLoader.rule_volumes is rule_volumes
+    assert ItemLoader.volume_max_chars is None
+
+    crawler.stats.set_value.assert_any_call("upkeep/volume/over_budget_rules", 1)
+    assert "1 parser rules have extracted more than 20 characters" in caplog.text
+    assert "parser/Loader/title/xpath/1 (max_chars=30" in caplog.text
@@ -0,0 +1,118 @@
+import logging
+from unittest import mock
+
+import pytest
+from scrapy.exceptions import NotConfigured
+from scrapy.settings import Settings
+
+from scrapy_loader_upkeep import ItemLoader
+from scrapy_loader_upkeep.extensions import RuleHitRateMonitor
+from scrapy_loader_upkeep.signals import rule_hit_rate_dropped
+from scrapy_loader_upkeep.windows import HitRateWindow, RuleWindows
+from tests.helpers import RESPONSE, TestItemLoader
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_hit_rate_window():
+    window = HitRateWindow(3)
+    window.add(0, True)
+    window.add(0, False)
+    window.add(1, True)
+    assert window.count(0, 1) == (2, 3)
+
+    # The slot of the bucket 0 is reused by the bucket 3.
+    window.add(3, False)
+    assert window.count(0, 3) == (1, 2)
+    assert len(window.epochs) == 3
+
+
+def record(windows, clock, label, hits, misses):
+    for _ in range(hits):
+        windows.record(label, True)
+    for _ in range(misses):
+        windows.record(label, False)
+    clock.now += 60
+
+
+def test_rule_windows():
+    clock = Clock()
+    windows = RuleWindows(span=2, buckets=5, min_evaluations=10, clock=clock)
+    hook = mock.Mock()
+    windows.hooks.append(hook)
+
+    record(windows, clock, "rule", 10, 0)
+    record(windows, clock, "rule", 10, 0)
+    assert windows.hit_rate("rule") == 1.0
+
+    # Each bucket is only checked once its next one starts.
+    record(windows, clock, "rule", 1, 9)
+    record(windows, clock, "rule", 0, 10)
+    assert not hook.called
+    record(windows, clock, "rule", 0, 1)
+    hook.assert_called_once_with("rule", 0.05, 20)
+
+    # It's only called again after recovering.
+    record(windows, clock, "rule", 0, 10)
+    record(windows, clock, "rule", 10, 0)
+    assert hook.call_count == 1
+
+    # The rules that have never been above the threshold never trigger it.
+    for _ in range(5):
+        record(windows, clock, "fallback", 1, 20)
+    assert hook.call_count == 1
+
+    assert windows.hit_rate("missing") is None
+    with pytest.raises(ValueError):
+        RuleWindows(span=5, buckets=5)
+
+
+def test_loader_rule_windows():
+    class WindowsItemLoader(TestItemLoader):
+        rule_windows = RuleWindows(min_evaluations=1)
+
+    loader = WindowsItemLoader(response=RESPONSE)
+    loader.add_css("title", ["h1::text", "h2::text", "h3::text"], first_match=True)
+
+    windows = WindowsItemLoader.rule_windows
+    assert windows.hit_rate("parser/WindowsItemLoader/title/css/1") == 0
+    assert windows.hit_rate("parser/WindowsItemLoader/title/css/2") == 1
+
+    # The skipped rules weren't evaluated.
+    assert windows.hit_rate("parser/WindowsItemLoader/title/css/3") is None
+
+
+def test_extension(caplog):
+    with pytest.raises(NotConfigured):
+        RuleHitRateMonitor.from_crawler(mock.Mock(settings=Settings()))
+
+    settings = Settings({"UPKEEP_WINDOWS_ENABLED": True, "UPKEEP_WINDOWS_SPAN": 3})
+    crawler = mock.Mock(settings=settings)
+    extension = RuleHitRateMonitor.from_crawler(crawler)
+    assert extension.windows.span == 3
+
+    extension.spider_opened(None)
+    assert ItemLoader.rule_windows is extension.windows
+    extension.spider_closed(None)
+    assert ItemLoader.rule_windows is None
+
+    with caplog.at_level(logging.WARNING):
+        for hook in extension.windows.hooks:
+            hook("parser/Loader/title/css/1", 0.25, 200)
+
+    assert "The hit rate of parser/Loader/title/css/1 has dropped to 25.0%" in (
+        caplog.text
+    )
+    crawler.stats.inc_value.assert_called_once_with("upkeep/windows/drops")
+    crawler.signals.send_catch_log.assert_called_once_with(
+        rule_hit_rate_dropped,
+        parser_label="parser/Loader/title/css/1",
+        hit_rate=0.25,
+        evaluations=200,
+    )